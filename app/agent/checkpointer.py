@@ -0,0 +1,72 @@
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata
+from langgraph.checkpoint.memory import InMemorySaver
+
+
+DEFAULT_MAX_THREADS = 1024
+
+
+class BoundedInMemorySaver(InMemorySaver):
+    """InMemorySaver that keeps only the latest checkpoint of the most recent threads.
+
+    Every put drops the thread's older checkpoints, their pending writes and any
+    channel blob the new checkpoint no longer references, so a conversation holds
+    one copy of its state instead of one per step. When more than `max_threads`
+    threads are stored, the least recently written one is deleted.
+    """
+
+    def __init__(self, max_threads: int = DEFAULT_MAX_THREADS, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        # thread ids, least recently written first
+        self._threads: OrderedDict[str, None] = OrderedDict()
+        self._lock = threading.RLock()
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with self._lock:
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = next_config["configurable"]["thread_id"]
+            checkpoint_ns = next_config["configurable"]["checkpoint_ns"]
+            self._prune(thread_id, checkpoint_ns, checkpoint["id"], checkpoint["channel_versions"])
+
+            self._threads[thread_id] = None
+            self._threads.move_to_end(thread_id)
+            while len(self._threads) > self.max_threads:
+                evicted, _ = self._threads.popitem(last=False)
+                super().delete_thread(evicted)
+            return next_config
+
+    def _prune(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        channel_versions: ChannelVersions,
+    ) -> None:
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        for old_id in [cid for cid in checkpoints if cid != checkpoint_id]:
+            del checkpoints[old_id]
+            self.writes.pop((thread_id, checkpoint_ns, old_id), None)
+        stale_blobs = [
+            key for key in self.blobs
+            if key[0] == thread_id
+            and key[1] == checkpoint_ns
+            and channel_versions.get(key[2]) != key[3]
+        ]
+        for key in stale_blobs:
+            del self.blobs[key]
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._threads.pop(thread_id, None)
+            super().delete_thread(thread_id)
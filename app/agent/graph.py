@@ -5,6 +5,7 @@ from langchain_core.messages import AnyMessage
 from langchain_core.documents import Document
 from langgraph.graph import message, StateGraph, START, END
 
+from app.agent.checkpointer import BoundedInMemorySaver
 from app.agent.nodes import (
     handle_qna_workflow,
     rewrite_user_query,
@@ -17,7 +18,7 @@ class GraphState(TypedDict):
     documents: Optional[list[Document]] = None
 
 
-def build_graph():
+def build_graph(checkpointer=None):
     # Define a new graph with state class
     workflow = StateGraph(GraphState)
 
@@ -31,11 +32,15 @@ def build_graph():
     workflow.add_edge("handle_qna_workflow", END)
 
     # Compile the workflow into an executable graph
-    graph = workflow.compile()
+    graph = workflow.compile(checkpointer=checkpointer)
     graph.name = "LocalRAG"
 
     return graph
 
 
-# Compile the graph once when the module is loaded
-graph = build_graph()
\ No newline at end of file
+# Compile the graph once when the module is loaded. The checkpointer keeps each
+# thread's (A2A context's) messages, so a turn only has to send the new message.
+# Unlike the A2A tasks (DatabaseTaskStore) it is in memory: conversations are
+# lost on restart, and only the latest checkpoint of the most recent threads
+# is kept.
+graph = build_graph(checkpointer=BoundedInMemorySaver())
\ No newline at end of file
@@ -1,20 +1,43 @@
-import datetime
+import functools
+from collections import OrderedDict
 from typing import Any
 
+import httpx
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, RemoveMessage, SystemMessage
+from langchain_core.messages.ai import add_ai_message_chunks
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 
-from app.db import get_vector_store
+from app.db import get_embeddings, get_vector_store
 from app.config.config import Configuration
-from app.agent.prompts import get_qna_citation_system_prompt, get_qna_no_documents_system_prompt
+from app.agent.prompts import (
+    get_qna_citation_system_prompt,
+    get_qna_no_documents_system_prompt,
+    get_rewrite_query_system_prompt,
+)
+from app.agent.semantic_cache import retrieval_cache
 
 
-config = Configuration.from_runnable_config()
+# a long query in a short conversation is already specific enough to search with
+REWRITE_SKIP_MIN_WORDS = 8
+REWRITE_SKIP_MAX_MESSAGES = 3
+REWRITE_CACHE_SIZE = 1024
+# (query, hash(chat history)) -> rewritten query, least recently used first
+_rewrite_cache: OrderedDict[tuple[str, int], str] = OrderedDict()
 
 
+@functools.cache
 def get_llm():
-    args = {"model": config.model}
+    """Return the shared chat model, built once so its HTTP connection pool is reused."""
+    config = Configuration.from_runnable_config()
+    args = {
+        "model": config.model,
+        "http_async_client": httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_keepalive_connections=16),
+        ),
+    }
     if config.api_key:
         args["api_key"] = config.api_key
     if config.base_url:
@@ -30,20 +53,24 @@ def get_llm():
     return ChatOpenAI(**args)
 
 
-def format_history(chat_history: list[BaseMessage]) -> str:
-    """Format the message history into a string."""
-    chat_history_str = "<chat_history>\n"
+# only the most recent turns are sent to the LLM as history, and kept in the
+# checkpointed state
+MAX_HISTORY_MESSAGES = 20
+
+_TAG = {HumanMessage: "user", AIMessage: "assistant", SystemMessage: "system"}
 
-    for chat_message in chat_history:
-        if isinstance(chat_message, HumanMessage):
-            chat_history_str += f"<user>{chat_message.content}</user>\n"
-        elif isinstance(chat_message, AIMessage):
-            chat_history_str += f"<assistant>{chat_message.content}</assistant>\n"
-        elif isinstance(chat_message, SystemMessage):
-            chat_history_str += f"<system>{chat_message.content}</system>\n"
 
-    chat_history_str += "</chat_history>"
-    return chat_history_str
+def format_history(chat_history: list[BaseMessage]) -> str:
+    """Format the message history into a string."""
+    return "\n".join([
+        "<chat_history>",
+        *(
+            f"<{tag}>{m.content}</{tag}>"
+            for m in chat_history[-MAX_HISTORY_MESSAGES:]
+            if (tag := _TAG.get(type(m)))
+        ),
+        "</chat_history>",
+    ])
 
 
 async def rewrite_user_query(state) -> dict[str, Any]:
@@ -51,59 +78,76 @@ async def rewrite_user_query(state) -> dict[str, Any]:
     messages = state["messages"]
     if len(messages) == 1:
         return {"rewrite_query": messages[0].content}
-    llm = get_llm()
+    query = messages[-1].content
+    if (
+        len(messages) <= REWRITE_SKIP_MAX_MESSAGES
+        and len(query.split()) >= REWRITE_SKIP_MIN_WORDS
+    ):
+        return {"rewrite_query": query}
 
     chat_history_str = format_history(messages[:-1])
+    cache_key = (query, hash(chat_history_str))
+    if (cached := _rewrite_cache.get(cache_key)) is not None:
+        _rewrite_cache.move_to_end(cache_key)
+        return {"rewrite_query": cached}
+
+    llm = get_llm()
     # Create system message with instructions
     system_message = SystemMessage(
-        content=f"""
-        Today's date: {datetime.datetime.now().strftime("%Y-%m-%d")}
-        You are a highly skilled AI assistant specializing in query optimization for advanced research.
-        Your primary objective is to transform a user's initial query into a highly effective search query.
-        This reformulated query will be used to retrieve information from diverse data sources.
-
-        **Chat History Context:**
-        {chat_history_str if chat_history_str else "No prior conversation history is available."}
-        If chat history is provided, analyze it to understand the user's evolving information needs and the broader context of their request. Use this understanding to refine the current query, ensuring it builds upon or clarifies previous interactions.
-
-        **Query Reformulation Guidelines:**
-        Your reformulated query should:
-        1.  **Enhance Specificity and Detail:** Add precision to narrow the search focus effectively, making the query less ambiguous and more targeted.
-        2.  **Resolve Ambiguities:** Identify and clarify vague terms or phrases. If a term has multiple meanings, orient the query towards the most likely one given the context.
-        3.  **Expand Key Concepts:** Incorporate relevant synonyms, related terms, and alternative phrasings for core concepts. This helps capture a wider range of relevant documents.
-        4.  **Deconstruct Complex Questions:** If the original query is multifaceted, break it down into its core searchable components or rephrase it to address each aspect clearly. The final output must still be a single, coherent query string.
-        5.  **Optimize for Comprehensiveness:** Ensure the query is structured to uncover all essential facets of the original request, aiming for thorough information retrieval suitable for research.
-        6.  **Maintain User Intent:** The reformulated query must stay true to the original intent of the user's query. Do not introduce new topics or shift the focus significantly.
-
-        **Crucial Constraints:**
-        *   **Conciseness and Effectiveness:** While aiming for comprehensiveness, the reformulated query MUST be as concise as possible. Eliminate all unnecessary verbosity. Focus on essential keywords, entities, and concepts that directly contribute to effective retrieval.
-        *   **Single, Direct Output:** Return ONLY the reformulated query itself. Do NOT include any explanations, introductory phrases (e.g., "Reformulated query:", "Here is the optimized query:"), or any other surrounding text or markdown formatting.
-
-        Your output should be a single, optimized query string, ready for immediate use in a search system.
-        """
+        content=get_rewrite_query_system_prompt(chat_history_str)
     )
 
     # Create human message with the user query
     human_message = HumanMessage(
-        content=f"Reformulate this query for better research results: {messages[-1].content}"
+        content=f"Reformulate this query for better research results: {query}"
     )
 
     # Get the response from the LLM
-    response = await llm.agenerate(messages=[[system_message, human_message]])
+    response = await llm.ainvoke([system_message, human_message])
 
     # Extract the reformulated query from the response
-    reformulated_query = response.generations[0][0].text.strip()
+    reformulated_query = response.content.strip()
 
     # Return the original query if the reformulation is empty
     if not reformulated_query:
-        return {"rewrite_query": messages[-1].content}
+        return {"rewrite_query": query}
 
+    _rewrite_cache[cache_key] = reformulated_query
+    if len(_rewrite_cache) > REWRITE_CACHE_SIZE:
+        _rewrite_cache.popitem(last=False)
     return {"rewrite_query": reformulated_query}
 
 
+class QueryEmbedding(Embeddings):
+    """Embeddings that answer one query with a vector computed beforehand."""
+
+    def __init__(self, embeddings: Embeddings, query: str, embedding: list[float]):
+        self.embeddings = embeddings
+        self.query = query
+        self.embedding = embedding
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embedding if text == self.query else self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return self.embedding if text == self.query else await self.embeddings.aembed_query(text)
+
+
 async def retrieve_relevant_documents(query: str):
     """Retrieve relevant documents based on the query."""
-    vector_store = get_vector_store()
+    embeddings = get_embeddings()
+    query_embedding = await embeddings.aembed_query(query)
+    documents = retrieval_cache.get(query_embedding)
+    if documents is not None:
+        return documents
+
+    config = Configuration.from_runnable_config()
+    # the hybrid search embeds the query itself, reuse the vector the cache lookup computed
+    vector_store = get_vector_store(QueryEmbedding(embeddings, query, query_embedding))
+    search_kwargs = {"k": config.retrieval_k, "fetch_k": config.retrieval_fetch_k, "timeout": 100}
     # rrf ranker, if use model ranker(eg. bge-reranker) need implement by yourself
     if config.ranker_endpoint:
         documents = await vector_store.asimilarity_search(query, ranker_type="model", ranker_params={
@@ -112,25 +156,28 @@ async def retrieve_relevant_documents(query: str):
             "queries": [query],
             "endpoint": config.ranker_endpoint,
             "truncate_prompt_tokens": 512
-        }, timeout=100)
+        }, **search_kwargs)
     else:
-        documents = await vector_store.asimilarity_search(query, ranker_type="rrf", timeout=100)
+        documents = await vector_store.asimilarity_search(
+            query, ranker_type="rrf", ranker_params={"k": config.rrf_k}, **search_kwargs
+        )
+    retrieval_cache.put(query_embedding, documents)
     return documents
 
 
+_DOC_TMPL = (
+    "<document><metadata><source>{source}</source></metadata>"
+    "<content>{content}</content></document>"
+)
+_DOCS_SECTION_TMPL = "{title}:\n<documents>\n{body}\n</documents>"
+
+
 def format_document_for_citation(document: Document) -> str:
     """Format a single document for citation in the standard XML format."""
-    content = document.page_content
-    source = document.metadata.get("source", "unknown_source")
-
-    return f"""<document>
-    <metadata>
-        <source>{source}</source>
-    </metadata>
-    <content>
-        {content}
-    </content>
-    </document>"""
+    return _DOC_TMPL.format(
+        source=document.metadata.get("source", "unknown_source"),
+        content=document.page_content,
+    )
 
 
 def format_documents_section(
@@ -140,12 +187,10 @@ def format_documents_section(
     if not documents:
         return ""
 
-    formatted_docs = [format_document_for_citation(doc) for doc in documents]
-
-    return f"""{section_title}:
-    <documents>
-    {chr(10).join(formatted_docs)}
-    </documents>"""
+    return _DOCS_SECTION_TMPL.format(
+        title=section_title,
+        body="\n".join(map(format_document_for_citation, documents)),
+    )
 
 
 async def handle_qna_workflow(state) -> dict[str, Any]:
@@ -198,9 +243,17 @@ async def handle_qna_workflow(state) -> dict[str, Any]:
         HumanMessage(content=human_message_content),
     ]
 
-    # Call the LLM and get the response
+    # Stream the LLM response, graph.astream(stream_mode="messages") forwards every chunk
     llm = get_llm()
-    response = await llm.ainvoke(messages_with_chat_history)
-    final_answer = response.content
-
-    return {"messages": AIMessage(content=final_answer), "documents": documents}
\ No newline at end of file
+    # merged once at the end, adding chunk by chunk copies the content so far every token
+    chunks = [chunk async for chunk in llm.astream(messages_with_chat_history)]
+    response = add_ai_message_chunks(*chunks) if chunks else AIMessage(content="")
+
+    # the checkpointer stores the thread's messages, keep only the ones a later
+    # prompt can still see so a long conversation does not grow without bound
+    expired = messages[:max(0, len(messages) + 1 - MAX_HISTORY_MESSAGES)]
+    # the aggregated message keeps the id of its chunks, so it is not streamed a second time
+    return {
+        "messages": [*(RemoveMessage(id=m.id) for m in expired), response],
+        "documents": documents,
+    }
\ No newline at end of file
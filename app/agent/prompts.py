@@ -1,3 +1,4 @@
+import string
 import datetime
 
 
@@ -193,4 +194,38 @@ When answering the user's question without access to their personal documents:
 5. Be clear that you're providing general information
 6. Suggest ways the user could get more personalized answers by expanding their knowledge base when relevant
 </user_query_instructions>
-"""
\ No newline at end of file
+"""
+
+
+_REWRITE_QUERY_SYSTEM_PROMPT = string.Template("""
+Today's date: $date
+You are a highly skilled AI assistant specializing in query optimization for advanced research.
+Your primary objective is to transform a user's initial query into a highly effective search query.
+This reformulated query will be used to retrieve information from diverse data sources.
+
+**Chat History Context:**
+$chat_history
+If chat history is provided, analyze it to understand the user's evolving information needs and the broader context of their request. Use this understanding to refine the current query, ensuring it builds upon or clarifies previous interactions.
+
+**Query Reformulation Guidelines:**
+Your reformulated query should:
+1.  **Enhance Specificity and Detail:** Add precision to narrow the search focus effectively, making the query less ambiguous and more targeted.
+2.  **Resolve Ambiguities:** Identify and clarify vague terms or phrases. If a term has multiple meanings, orient the query towards the most likely one given the context.
+3.  **Expand Key Concepts:** Incorporate relevant synonyms, related terms, and alternative phrasings for core concepts. This helps capture a wider range of relevant documents.
+4.  **Deconstruct Complex Questions:** If the original query is multifaceted, break it down into its core searchable components or rephrase it to address each aspect clearly. The final output must still be a single, coherent query string.
+5.  **Optimize for Comprehensiveness:** Ensure the query is structured to uncover all essential facets of the original request, aiming for thorough information retrieval suitable for research.
+6.  **Maintain User Intent:** The reformulated query must stay true to the original intent of the user's query. Do not introduce new topics or shift the focus significantly.
+
+**Crucial Constraints:**
+*   **Conciseness and Effectiveness:** While aiming for comprehensiveness, the reformulated query MUST be as concise as possible. Eliminate all unnecessary verbosity. Focus on essential keywords, entities, and concepts that directly contribute to effective retrieval.
+*   **Single, Direct Output:** Return ONLY the reformulated query itself. Do NOT include any explanations, introductory phrases (e.g., "Reformulated query:", "Here is the optimized query:"), or any other surrounding text or markdown formatting.
+
+Your output should be a single, optimized query string, ready for immediate use in a search system.
+""")
+
+
+def get_rewrite_query_system_prompt(chat_history: str | None = None):
+    return _REWRITE_QUERY_SYSTEM_PROMPT.substitute(
+        date=datetime.datetime.now().strftime("%Y-%m-%d"),
+        chat_history=chat_history if chat_history else "No prior conversation history is available.",
+    )
@@ -0,0 +1,132 @@
+import time
+import threading
+from collections import deque
+from typing import Any
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+DEFAULT_MAX_SIZE = 256
+DEFAULT_THRESHOLD = 0.95
+DEFAULT_TTL = 300.0
+
+
+class SemanticCache:
+    """LRU + TTL cache of retrieved documents keyed by query embedding.
+
+    A lookup hits when the cosine similarity between the query embedding and a
+    cached one is at least `threshold`. Embeddings are stored L2-normalized in
+    one matrix so a lookup is a single matrix-vector product.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SIZE,
+        threshold: float = DEFAULT_THRESHOLD,
+        ttl: float = DEFAULT_TTL,
+    ):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl = ttl
+
+        # (max_size, d) matrix, allocated on the first put once d is known
+        self._matrix: np.ndarray | None = None
+        self._payload: list[list[Document]] = []
+        self._expires_at = np.zeros(max_size, dtype=np.float64)
+        # slot indices, least recently used first
+        self._order: deque[int] = deque()
+        self._lock = threading.RLock()
+
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _normalize(embedding: list[float]) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def get(self, embedding: list[float]) -> list[Document] | None:
+        """Return the cached documents for a semantically similar query, if any."""
+        query = self._normalize(embedding)
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != query.shape[0]:
+                self._misses += 1
+                return None
+            size = self._drop_expired()
+            if not size:
+                self._misses += 1
+                return None
+
+            scores = self._matrix[:size] @ query
+            slot = int(np.argmax(scores))
+            if scores[slot] < self.threshold:
+                self._misses += 1
+                return None
+
+            self._order.remove(slot)
+            self._order.append(slot)
+            self._hits += 1
+            return list(self._payload[slot])
+
+    def put(self, embedding: list[float], documents: list[Document]) -> None:
+        """Cache the documents retrieved for a query embedding."""
+        vec = self._normalize(embedding)
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != vec.shape[0]:
+                self._reset(vec.shape[0])
+            self._drop_expired()
+
+            if len(self._payload) < self.max_size:
+                slot = len(self._payload)
+                self._payload.append(list(documents))
+            else:
+                slot = self._order.popleft()
+                self._payload[slot] = list(documents)
+
+            self._matrix[slot] = vec
+            self._expires_at[slot] = time.monotonic() + self.ttl
+            self._order.append(slot)
+
+    def _drop_expired(self) -> int:
+        """Compact expired entries out of the matrix, return the live entry count."""
+        size = len(self._payload)
+        live = np.flatnonzero(self._expires_at[:size] >= time.monotonic())
+        if len(live) == size:
+            return size
+        # fancy indexing copies, so the rows can be written back in place
+        self._matrix[:len(live)] = self._matrix[live]
+        self._expires_at[:len(live)] = self._expires_at[live]
+        self._payload[:] = [self._payload[slot] for slot in live]
+        moved = {int(old): new for new, old in enumerate(live)}
+        self._order = deque(moved[slot] for slot in self._order if slot in moved)
+        return len(live)
+
+    def _reset(self, dim: int) -> None:
+        self._matrix = np.zeros((self.max_size, dim), dtype=np.float32)
+        self._payload.clear()
+        self._order.clear()
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._matrix = None
+            self._payload.clear()
+            self._order.clear()
+
+    def get_stats(self) -> dict[str, Any]:
+        """Return hit/miss counters for the cache."""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "size": len(self._payload),
+                "hit_rate": self._hits / total if total else 0.0,
+            }
+
+
+# semantically similar queries reuse the previous retrieval result; shared by
+# retrieval and the document API, which clears it when the vector store changes
+retrieval_cache = SemanticCache()
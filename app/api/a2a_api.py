@@ -1,3 +1,6 @@
+import uuid
+import functools
+
 from fastapi import FastAPI
 from langchain_core.messages import HumanMessage, BaseMessage
 
@@ -22,14 +25,11 @@ from a2a.server.tasks import DatabaseTaskStore, TaskUpdater
 from a2a.utils import new_agent_text_message, new_agent_parts_message, new_task
 from a2a.utils.errors import ServerError
 
-from app.db import engine
+from app.db import get_engine
 from app.agent.graph import graph
 from app.config.config import Configuration
 
 
-config = Configuration.from_runnable_config()
-
-
 def create_a2a_router(app_internal: FastAPI):
     agent = AgenticRAGExecutor()
     handler = DefaultRequestHandler(
@@ -47,29 +47,39 @@ def create_a2a_router(app_internal: FastAPI):
     )
 
 
+_SKILLS = (
+    AgentSkill(
+        id="agentic_rag",
+        name="Agentic RAG",
+        description="A helpful agent that can answer questions using RAG and tools.",
+        tags=["rag", "tools"],
+        examples=["write a summary of the document", "explain the document"],
+    ),
+)
+
+
+@functools.cache
+def get_agent_card() -> AgentCard:
+    """Build the public agent card once per process."""
+    config = Configuration.from_runnable_config()
+    return AgentCard(
+        name="Agentic RAG",
+        description="A helpful agent that can answer questions using RAG and tools.",
+        url=config.agent_url,
+        version='1.0.0',
+        defaultInputModes=['text'],
+        defaultOutputModes=['text'],
+        capabilities=AgentCapabilities(streaming=True, push_notifications=False),
+        skills=list(_SKILLS),  # Only the basic skill for the public card
+    )
+
+
 class AgenticRAGExecutor(AgentExecutor):
     def __init__(self):
-        skills = [AgentSkill(
-            id="agentic_rag",
-            name="Agentic RAG",
-            description="A helpful agent that can answer questions using RAG and tools.",
-            tags=["rag", "tools"],
-            examples=["write a summary of the document", "explain the document"],
-        )]
-        agent_card = AgentCard(
-            name="Agentic RAG",
-            description="A helpful agent that can answer questions using RAG and tools.",
-            url=config.agent_url,
-            version='1.0.0',
-            defaultInputModes=['text'],
-            defaultOutputModes=['text'],
-            capabilities=AgentCapabilities(streaming=True, push_notifications=False),
-            skills=skills,  # Only the basic skill for the public card
-        )
-        self.agent_card = agent_card
+        self.agent_card = get_agent_card()
         # sqlite databases only allow one process to access it at a time.
         # use InMemoryTaskStore instead
-        self.task_store = DatabaseTaskStore(engine)
+        self.task_store = DatabaseTaskStore(get_engine())
 
     def _validate_request(self, context: RequestContext) -> bool:
         if context.get_user_input():
@@ -116,10 +126,18 @@ class AgenticRAGExecutor(AgentExecutor):
         request_messages: list[BaseMessage],
     ) -> None:
         state = {"messages": request_messages}
+        # stream the answer as chunks appended to a single artifact
+        artifact_id = str(uuid.uuid4())
+        append = False
         async for _, chunk in graph.astream(state, {"configurable": {"thread_id": context.context_id}}, stream_mode=["messages"]):
             msg, meta = chunk
-            if meta["langgraph_node"] == "handle_qna_workflow":
-                await updater.add_artifact(parts=[Part(root=TextPart(text=msg.content))])
+            if meta["langgraph_node"] == "handle_qna_workflow" and msg.content:
+                await updater.add_artifact(
+                    parts=[Part(root=TextPart(text=msg.content))],
+                    artifact_id=artifact_id,
+                    append=append,
+                )
+                append = True
         await updater.update_status(
             TaskState.completed,
             final=True
@@ -1,34 +1,100 @@
 import os
+import re
+import time
+import uuid
+import asyncio
+import contextlib
+import dataclasses
+import functools
+import itertools
 import logging
+import tempfile
+from typing import Any
 
 from langchain_community.document_loaders import (
     PyPDFLoader,
     UnstructuredMarkdownLoader
 )
+from sqlalchemy import Row, delete, update
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import APIRouter, Depends, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, UploadFile
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from app.models.api import PaginatedResponse, DocumentRead
-from app.db import get_async_session, Document, DocumentType, get_vector_store
-from app.utils import generate_unique_identifier_hash, generate_content_hash
+from app.agent.semantic_cache import retrieval_cache
+from app.models.api import PaginatedResponse, DocumentRead, DocumentBulkDelete
+from app.db import (
+    VECTOR_PRIMARY_FIELD,
+    VECTOR_TEXT_FIELD,
+    Document,
+    DocumentType,
+    get_async_session,
+    get_async_session_maker,
+    get_config,
+    get_embeddings,
+    get_vector_store,
+)
+from app.utils import generate_unique_identifier_hash, generate_joined_content_hash
 
 
 DEFAULT_SPLITTER = "\n\n"
+# embedding servers usually cap the number of inputs per request
+EMBEDDING_BATCH_SIZE = 100
+MAX_PAGE_SIZE = 10_000
+# chunk ids per vector store query when looking up a document's stored chunks
+CHUNK_ID_QUERY_BATCH_SIZE = 1000
+UPLOAD_READ_CHUNK_SIZE = 1 << 20
+# chunked uploads not completed within this many seconds are discarded
+CHUNKED_UPLOAD_TTL = 3600
+# one chunk request is read into memory, up to its Content-Range, before it is written
+MAX_UPLOAD_CHUNK_SIZE = 64 * 1024 * 1024
+CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+# the splitter is stateless, build it (and its separator list) once
+TEXT_SPLITTER = RecursiveCharacterTextSplitter(
+    chunk_size=1024,
+    chunk_overlap=100,
+    length_function=len,
+    separators=["\n\n", "\n", ". ", " ", ""],
+)
 router = APIRouter()
 
 
 async def get_document_by_unique_identifier_hash(
     unique_identifier_hash: str,
     session: AsyncSession,
-) -> Document | None:
-    """Get document by unique identifier hash."""
+) -> Row | None:
+    """Get id, content hash and related chunks of the document with the unique identifier hash.
+
+    The content column is not loaded, an unchanged upload only needs the hash.
+    """
     existing_doc_result = await session.execute(
-        select(Document)
+        select(Document.id, Document.content_hash, Document.related_chunks)
         .where(Document.unique_identifier_hash == unique_identifier_hash)
     )
-    return existing_doc_result.scalars().first()
+    return existing_doc_result.first()
+
+
+async def embed_texts(texts: list[str]) -> list[list[float]]:
+    """Embed texts in batches of EMBEDDING_BATCH_SIZE."""
+    vectors = []
+    for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        vectors.extend(await get_embeddings().aembed_documents(texts[i:i + EMBEDDING_BATCH_SIZE]))
+    return vectors
+
+
+async def get_stored_chunk_ids(vector_store, chunk_ids: list) -> dict[str, Any]:
+    """Map the text of already stored chunks to their vector store ids."""
+    stored = {}
+    for batch in itertools.batched(chunk_ids or (), CHUNK_ID_QUERY_BATCH_SIZE):
+        rows = await asyncio.to_thread(
+            vector_store.client.query,
+            vector_store.collection_name,
+            filter=f"{VECTOR_PRIMARY_FIELD} in {list(batch)}",
+            output_fields=[VECTOR_PRIMARY_FIELD, VECTOR_TEXT_FIELD],
+            limit=len(batch),
+        )
+        stored.update((row[VECTOR_TEXT_FIELD], row[VECTOR_PRIMARY_FIELD]) for row in rows)
+    return stored
 
 
 async def process_file_upload_task(file_path: str, file_name: str, session: AsyncSession):
@@ -42,13 +108,15 @@ async def process_file_upload_task(file_path: str, file_name: str, session: Asyn
         document_type = DocumentType.MARKDOWN
     else:
         raise HTTPException(status_code=400, detail=f"Unsupported file format: {file_ext}")
-    documents = loader.load()
+    # parse in a worker thread so concurrent uploads don't block the event loop
+    documents = await loader.aload()
     unique_identifier_hash = generate_unique_identifier_hash(
         document_type=document_type,
         unique_identifier=file_name,
     )
-    content = DEFAULT_SPLITTER.join([doc.page_content for doc in documents])
-    content_hash = generate_content_hash(content)
+    content_hash = generate_joined_content_hash(
+        (doc.page_content for doc in documents), DEFAULT_SPLITTER
+    )
 
     existing_document = await get_document_by_unique_identifier_hash(
         unique_identifier_hash, session
@@ -59,30 +127,55 @@ async def process_file_upload_task(file_path: str, file_name: str, session: Asyn
             return
         else:
             logging.info(f"Document {file_name} has changed.")
+    # only materialize the full text once it actually has to be stored
+    content = DEFAULT_SPLITTER.join(doc.page_content for doc in documents)
 
-    # 分割文档
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1024,
-        chunk_overlap=100,
-        length_function=len
-    )
     for doc in documents:
         doc.metadata["source"] = file_name
-    chunks = text_splitter.split_documents(documents)
+    # 分割文档
+    chunks = TEXT_SPLITTER.split_documents(documents)
+    # repeated chunks (headers, footers, boilerplate pages) only need to be embedded once
+    unique_chunks = {}
+    for chunk in chunks:
+        unique_chunks.setdefault(chunk.page_content, chunk)
+    chunks = list(unique_chunks.values())
 
     vector_store = get_vector_store()
-    related_chunks = await vector_store.aadd_documents(chunks)
+    # a changed document usually keeps most of its chunks, reuse the stored
+    # ones and only embed and insert what is new
+    stored_chunks = await get_stored_chunk_ids(
+        vector_store, existing_document.related_chunks if existing_document else []
+    )
+    related_chunks = [stored_chunks[c.page_content] for c in chunks if c.page_content in stored_chunks]
+    chunks = [c for c in chunks if c.page_content not in stored_chunks]
+    if chunks:
+        texts = [chunk.page_content for chunk in chunks]
+        related_chunks += await vector_store.aadd_embeddings(
+            texts=texts,
+            embeddings=await embed_texts(texts),
+            metadatas=[chunk.metadata for chunk in chunks],
+        )
 
     if existing_document:
-        existing_document.content = content
-        existing_document.content_hash = content_hash
-
-        deleted_chunks = existing_document.related_chunks
-        existing_document.related_chunks = related_chunks
+        await session.execute(
+            update(Document)
+            .where(Document.id == existing_document.id)
+            .values(
+                content=content,
+                content_hash=content_hash,
+                related_chunks=related_chunks,
+            )
+        )
+        kept_chunks = set(related_chunks)
+        deleted_chunks = [
+            chunk_id for chunk_id in existing_document.related_chunks or ()
+            if chunk_id not in kept_chunks
+        ]
 
         await session.commit()
         if deleted_chunks:
             await vector_store.adelete(ids=deleted_chunks)
+        retrieval_cache.clear()
     else:
         new_document = Document(
             unique_identifier_hash=unique_identifier_hash,
@@ -97,110 +190,267 @@ async def process_file_upload_task(file_path: str, file_name: str, session: Asyn
         )
         session.add(new_document)
         await session.commit()
+        retrieval_cache.clear()
+
+
+@functools.cache
+def get_upload_semaphore() -> asyncio.Semaphore:
+    return asyncio.Semaphore(get_config().upload_concurrency)
+
+
+async def process_file_upload_in_new_session(file_path: str, file_name: str):
+    """Process one upload in its own session, AsyncSession is not concurrency-safe."""
+    # bounds pooled connections and embedding jobs across all upload requests
+    async with get_upload_semaphore(), get_async_session_maker()() as session:
+        await process_file_upload_task(file_path, file_name, session)
+
+
+@dataclasses.dataclass
+class ChunkedUpload:
+    """A file being assembled from ranged chunks, see upload_document_chunk."""
+    file_path: str
+    file_name: str
+    total: int
+    started_at: float = dataclasses.field(default_factory=time.monotonic)
+    # sorted, non-overlapping [start, end) byte ranges written so far, so a
+    # retried or overlapping chunk never counts twice
+    received: list[tuple[int, int]] = dataclasses.field(default_factory=list)
+
+    def add_range(self, start: int, end: int) -> None:
+        merged: list[tuple[int, int]] = []
+        for range_start, range_end in sorted([*self.received, (start, end)]):
+            if merged and range_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], range_end))
+            else:
+                merged.append((range_start, range_end))
+        self.received = merged
+
+    @property
+    def received_bytes(self) -> int:
+        return sum(end - start for start, end in self.received)
+
+    @property
+    def complete(self) -> bool:
+        return self.received == [(0, self.total)]
+
+
+# upload state lives in this process, chunks sent to different workers would
+# never assemble. The same holds for retrieval_cache.clear(): with more than one
+# worker, the other processes keep serving stale retrievals until their TTL expires
+CHUNKED_UPLOADS_ENABLED = int(os.getenv("UVICORN_WORKERS") or 1) <= 1
+chunked_uploads: dict[str, ChunkedUpload] = {}
+
+
+def write_chunk(file_path: str, offset: int, data: bytes) -> None:
+    """Write data at offset, creating the file; safe for concurrent chunks."""
+    fd = os.open(file_path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view, offset = view[written:], offset + written
+    finally:
+        os.close(fd)
+
+
+def remove_file(file_path: str) -> None:
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(file_path)
+
+
+async def discard_stale_chunked_uploads() -> None:
+    deadline = time.monotonic() - CHUNKED_UPLOAD_TTL
+    for upload_id, upload in list(chunked_uploads.items()):
+        if upload.started_at < deadline:
+            del chunked_uploads[upload_id]
+            await asyncio.to_thread(remove_file, upload.file_path)
 
 
 @router.post("/documents/fileupload")
-async def create_documents_file_upload(
-    files: list[UploadFile],
-    session: AsyncSession = Depends(get_async_session),
-):
+async def create_documents_file_upload(files: list[UploadFile]):
+    # no request session: each file is processed in a session of its own
+    uploads = []
     try:
         if not files:
             raise HTTPException(status_code=400, detail="No files provided")
 
         for file in files:
-            try:
-                # Save file to a temporary location to avoid stream issues
-                import os
-                import tempfile
-
-                # Create temp file
-                with tempfile.NamedTemporaryFile(
-                    delete=False, suffix=os.path.splitext(file.filename)[1]
-                ) as temp_file:
-                    temp_path = temp_file.name
-
-                # Write uploaded file to temp file
-                content = await file.read()
-                with open(temp_path, "wb") as f:
-                    f.write(content)
-
-                await process_file_upload_task(temp_path, file.filename, session)
-            except Exception as e:
-                raise HTTPException(
-                    status_code=422,
-                    detail=f"Failed to process file {file.filename}: {e!s}",
-                ) from e
+            # Save file to a temporary location to avoid stream issues,
+            # copying it in fixed-size chunks instead of reading it into memory
+            with tempfile.NamedTemporaryFile(
+                delete=False, suffix=os.path.splitext(file.filename)[1]
+            ) as temp_file:
+                uploads.append((temp_file.name, file.filename))
+                while chunk := await file.read(UPLOAD_READ_CHUNK_SIZE):
+                    temp_file.write(chunk)
+
+        # files are independent, process them concurrently
+        results = await asyncio.gather(
+            *[process_file_upload_in_new_session(path, name) for path, name in uploads],
+            return_exceptions=True,
+        )
 
-        await session.commit()
-        return {"message": "Files uploaded for processing"}
+        processed, failed = [], []
+        for (_, file_name), result in zip(uploads, results):
+            # a cancelled file comes back as CancelledError, a BaseException
+            if isinstance(result, BaseException):
+                failed.append({"file": file_name, "error": f"{result!s}"})
+            else:
+                processed.append(file_name)
+
+        if not processed:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Failed to process files: {failed}",
+            )
+        return {
+            "message": "Files uploaded for processing",
+            "processed": processed,
+            "failed": failed,
+        }
     except HTTPException:
         raise
     except Exception as e:
-        await session.rollback()
         raise HTTPException(
             status_code=500, detail=f"Failed to upload files: {e!s}"
         ) from e
+    finally:
+        for temp_path, _ in uploads:
+            os.unlink(temp_path)
+
+
+@router.post("/documents/chunk")
+async def upload_document_chunk(
+    request: Request,
+    file_name: str,
+    upload_id: str = Header(...),
+    content_range: str = Header(...),
+):
+    """Receive one byte range of a large file.
+
+    Chunks of the same Upload-Id may arrive in any order and in parallel, each
+    is written at its offset of a temporary file. The request that completes
+    the file processes it like /documents/fileupload and returns the result.
+    Needs a single worker process, other setups get 501.
+    """
+    if not CHUNKED_UPLOADS_ENABLED:
+        raise HTTPException(
+            status_code=501,
+            detail="Chunked uploads need a single worker (UVICORN_WORKERS=1), use /documents/fileupload",
+        )
+    match = CONTENT_RANGE_RE.fullmatch(content_range)
+    if not match:
+        raise HTTPException(status_code=400, detail=f"Invalid Content-Range: {content_range}")
+    start, end, total = map(int, match.groups())
+    if not start <= end < total:
+        raise HTTPException(status_code=400, detail=f"Invalid Content-Range: {content_range}")
+    if end - start + 1 > MAX_UPLOAD_CHUNK_SIZE:
+        raise HTTPException(status_code=413, detail=f"Chunks are limited to {MAX_UPLOAD_CHUNK_SIZE} bytes")
+
+    upload = chunked_uploads.get(upload_id)
+    if upload is None:
+        await discard_stale_chunked_uploads()
+        # registered before any await, so parallel first chunks share it; the
+        # file itself is created by the first write
+        file_path = os.path.join(
+            tempfile.gettempdir(), f"localrag-upload-{uuid.uuid4().hex}{os.path.splitext(file_name)[1]}"
+        )
+        upload = chunked_uploads.setdefault(upload_id, ChunkedUpload(file_path, file_name, total))
+    if upload.total != total:
+        raise HTTPException(status_code=400, detail="Content-Range total does not match the upload")
+
+    # read no more than Content-Range declares, the header alone bounds nothing
+    size = end - start + 1
+    data = bytearray()
+    async for part in request.stream():
+        data += part
+        if len(data) > size:
+            raise HTTPException(status_code=413, detail="Chunk is larger than its Content-Range")
+    if len(data) < size:
+        raise HTTPException(status_code=400, detail="Chunk is shorter than its Content-Range")
+    await asyncio.to_thread(write_chunk, upload.file_path, start, data)
+    upload.add_range(start, end + 1)
+
+    # another chunk may have completed the upload while this one was writing
+    if not upload.complete or chunked_uploads.pop(upload_id, None) is None:
+        return {"upload_id": upload_id, "received": upload.received_bytes}
+
+    try:
+        await process_file_upload_in_new_session(upload.file_path, upload.file_name)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Failed to process files: {[{'file': upload.file_name, 'error': f'{e!s}'}]}",
+        ) from e
+    finally:
+        await asyncio.to_thread(remove_file, upload.file_path)
+    return {
+        "message": "Files uploaded for processing",
+        "processed": [upload.file_name],
+        "failed": [],
+    }
 
 
 @router.get("/documents/", response_model=PaginatedResponse[DocumentRead])
 async def list_documents(
-    skip: int | None = None,
-    page: int | None = None,
-    page_size: int = 50,
+    skip: int | None = Query(None, ge=0),
+    page: int | None = Query(None, ge=0),
+    page_size: int = Query(50, ge=-1),
     document_types: str | None = None,
     session: AsyncSession = Depends(get_async_session),
 ):
     """List documents"""
+    if page_size == 0:
+        raise HTTPException(status_code=422, detail="page_size must be positive or -1")
     try:
         from sqlalchemy import func
 
-        query = select(Document)
         # Filter by document_types if provided
-        if document_types is not None and document_types.strip():
-            type_list = [t.strip() for t in document_types.split(",") if t.strip()]
-            if type_list:
-                query = query.filter(Document.document_type.in_(type_list))
+        type_list = [t.strip() for t in (document_types or "").split(",") if t.strip()]
+        filters = [Document.document_type.in_(type_list)] if type_list else []
+
+        query = select(Document).where(*filters)
+        count_query = select(func.count()).select_from(Document).where(*filters)
 
         # Get total count
-        count_query = (select(func.count()).select_from(Document))
-        if document_types is not None and document_types.strip():
-            type_list = [t.strip() for t in document_types.split(",") if t.strip()]
-            if type_list:
-                count_query = count_query.filter(Document.document_type.in_(type_list))
         total_result = await session.execute(count_query)
         total = total_result.scalar() or 0
 
+        # page_size == -1 means "everything", bounded by the server-side maximum
+        limit = MAX_PAGE_SIZE if page_size == -1 else min(page_size, MAX_PAGE_SIZE)
+
         # Calculate offset
         offset = 0
         if skip is not None:
             offset = skip
         elif page is not None:
-            offset = page * page_size
+            offset = page * limit
 
         # Get paginated results
-        if page_size == -1:
-            result = await session.execute(query.offset(offset))
-        else:
-            result = await session.execute(query.offset(offset).limit(page_size))
-
+        result = await session.execute(query.offset(offset).limit(limit))
         db_documents = result.scalars().all()
 
         # Convert database objects to API-friendly format
-        api_documents = []
-        for doc in db_documents:
-            api_documents.append(
-                DocumentRead(
-                    id=doc.id,
-                    title=doc.title,
-                    document_type=doc.document_type,
-                    document_metadata=doc.document_metadata,
-                    content=doc.content,
-                    created_at=doc.created_at,
-                )
+        api_documents = [
+            DocumentRead(
+                id=doc.id,
+                title=doc.title,
+                document_type=doc.document_type,
+                document_metadata=doc.document_metadata,
+                content=doc.content,
+                created_at=doc.created_at,
             )
-
-        return PaginatedResponse(items=api_documents, total=total)
+            for doc in db_documents
+        ]
+
+        next_offset = offset + len(api_documents)
+        return PaginatedResponse(
+            items=api_documents,
+            total=total,
+            next_cursor=next_offset if next_offset < total else None,
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to fetch documents: {e!s}"
@@ -231,6 +481,7 @@ async def delete_document(
 
         await session.delete(document)
         await session.commit()
+        retrieval_cache.clear()
         return {"message": "Document deleted successfully"}
     except HTTPException:
         raise
@@ -238,4 +489,41 @@ async def delete_document(
         await session.rollback()
         raise HTTPException(
             status_code=500, detail=f"Failed to delete document: {e!s}"
-        ) from e
\ No newline at end of file
+        ) from e
+
+
+@router.post("/documents/bulk-delete", response_model=dict)
+async def bulk_delete_documents(
+    request: DocumentBulkDelete,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Delete several documents with one vector store delete and one DB delete."""
+    try:
+        result = await session.execute(
+            select(Document.id, Document.related_chunks).where(
+                Document.id.in_(request.ids)
+            )
+        )
+        rows = result.all()
+        if not rows:
+            raise HTTPException(status_code=404, detail="No documents found")
+
+        deleted_chunks = list(
+            itertools.chain.from_iterable(row.related_chunks or () for row in rows)
+        )
+        if deleted_chunks:
+            vector_store = get_vector_store()
+            await vector_store.adelete(ids=deleted_chunks)
+
+        deleted_ids = [row.id for row in rows]
+        await session.execute(delete(Document).where(Document.id.in_(deleted_ids)))
+        await session.commit()
+        retrieval_cache.clear()
+        return {"message": "Documents deleted successfully", "deleted": deleted_ids}
+    except HTTPException:
+        raise
+    except Exception as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=500, detail=f"Failed to delete documents: {e!s}"
+        ) from e
@@ -5,20 +5,27 @@ from fastapi.middleware.cors import CORSMiddleware
 from a2a.types import A2ARequest
 
 from app.api import router
+from app.db import get_embeddings, init_db
 from app.api.a2a_api import create_a2a_router
 
+# generated once per process, the A2ARequest union is expensive to build
+_A2A_REQUEST_SCHEMA = A2ARequest.model_json_schema(
+    ref_template='#/components/schemas/{model}'
+)
+_A2A_REQUEST_DEFS = _A2A_REQUEST_SCHEMA.pop('$defs', {})
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
-    a2a_request_schema = A2ARequest.model_json_schema(
-        ref_template='#/components/schemas/{model}'
-    )
-    defs = a2a_request_schema.pop('$defs', {})
     openapi_schema = app.openapi()
     component_schemas = openapi_schema.setdefault(
         'components', {}
     ).setdefault('schemas', {})
-    component_schemas.update(defs)
-    component_schemas['A2ARequest'] = a2a_request_schema
+    component_schemas.update(_A2A_REQUEST_DEFS)
+    component_schemas['A2ARequest'] = _A2A_REQUEST_SCHEMA
+    await init_db()
+    # load the embedding model before serving instead of on the first query
+    get_embeddings()
 
     yield
 
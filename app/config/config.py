@@ -1,6 +1,9 @@
 import os
 import logging
+import functools
 import dataclasses
+import typing
+import urllib.parse
 from typing import Any, Optional
 
 from langchain_core import runnables
@@ -16,8 +19,22 @@ class Configuration:
     """Main configuration class for the system."""
     agent_url: str = f"http://localhost:8000/a2a"
     database_url: str = DATABASE_URL
+    # connection pool for server databases, sqlite keeps SQLAlchemy's defaults
+    db_pool_size: int = 20
+    db_max_overflow: int = 40
     vector_store_uri: str = VECTOR_STORE_URI
     embedding_model: str = DEFAULT_EMBEDDING_MODEL
+    # sentence-transformers backend: "torch", "onnx" or "openvino". onnx needs
+    # optimum + onnxruntime; point embedding_model_file at a quantized export,
+    # e.g. "onnx/model_qint8_avx512_vnni.onnx"
+    embedding_backend: str = "torch"
+    embedding_model_file: str | None = None
+    # None picks cuda when available, else cpu
+    embedding_device: str | None = None
+    embedding_batch_size: int = 64
+    # files parsed and embedded at once per process; each holds a database
+    # connection until it commits, keep it below the pool size (15 for sqlite)
+    upload_concurrency: int = 4
 
     model: str = "gpt-4o-mini"
     api_key: str | None = None
@@ -28,6 +45,18 @@ class Configuration:
     logprobs: bool | None = None
     ranker_endpoint: str | None = None
 
+    # hybrid search: results returned, candidates fetched per vector field, RRF constant
+    retrieval_k: int = 4
+    retrieval_fetch_k: int = 20
+    rrf_k: int = 60
+
+    # dense HNSW index (Milvus server only): graph degree, build and search
+    # candidate list sizes. Rough tiers: <100K vectors 16/64/40,
+    # <1M 24/128/100, larger 32/200/200. ef_search must be >= retrieval_fetch_k
+    hnsw_m: int = 24
+    hnsw_ef_construction: int = 128
+    hnsw_ef_search: int = 100
+
     @classmethod
     def from_runnable_config(
         cls, config: Optional[runnables.RunnableConfig] = None
@@ -36,16 +65,66 @@ class Configuration:
         configurable = (
             config["configurable"] if config and "configurable" in config else {}
         )
+        if not configurable:
+            # environment-only configuration never changes within a process
+            return cls._from_env()
+        return cls._from_configurable(configurable)
+
+    @classmethod
+    @functools.cache
+    def _from_env(cls) -> "Configuration":
+        return cls._from_configurable({})
+
+    @classmethod
+    def _from_configurable(cls, configurable: dict[str, Any]) -> "Configuration":
         values: dict[str, Any] = {
-            f.name: os.environ.get(f.name.upper(), configurable.get(f.name))
+            f.name: _coerce(f, os.environ.get(f.name.upper(), configurable.get(f.name)))
             for f in dataclasses.fields(cls)
             if f.init
         }
-        logging.info("Configuration values: %s", values)
+        logging.info("Configuration values: %s", _redact(values))
 
         return cls(**{k: v for k, v in values.items() if v})
 
 
+_SECRET_FIELDS = {"api_key"}
+
+
+def _coerce(field: dataclasses.Field, value: Any) -> Any:
+    """Convert string values (e.g. from environment variables) to the field type."""
+    if not isinstance(value, str):
+        return value
+    field_types = typing.get_args(field.type) or (field.type,)
+    if bool in field_types:
+        return _parse_bool(value)
+    if int in field_types:
+        return _parse_int(value, field.name.upper())
+    if float in field_types:
+        try:
+            return float(value)
+        except ValueError:
+            raise ValueError(f"Invalid float value for {field.name.upper()}: {value}") from None
+    return value
+
+
+def _redact(values: dict[str, Any]) -> dict[str, Any]:
+    """Mask secrets and URL credentials before logging configuration values."""
+    redacted = {}
+    for key, value in values.items():
+        if value and key in _SECRET_FIELDS:
+            value = "***"
+        elif isinstance(value, str) and "@" in value:
+            parts = urllib.parse.urlsplit(value)
+            if parts.username or parts.password:
+                # keep everything after the credentials as written: the host
+                # may be empty (unix socket DSNs), a bracketed IPv6 address or
+                # carry a port
+                host = parts.netloc.rpartition("@")[2]
+                value = parts._replace(netloc=f"***@{host}").geturl()
+        redacted[key] = value
+    return redacted
+
+
 def _parse_bool(value):
     """Parse boolean value from string."""
     return value.lower() == "true" if value else False
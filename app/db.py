@@ -1,3 +1,4 @@
+import functools
 from datetime import UTC, datetime
 from enum import Enum
 from typing import AsyncGenerator
@@ -11,33 +12,122 @@ from sqlalchemy import (
     Integer,
     String,
     Text,
+    event,
 )
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, declared_attr
+from langchain_core.embeddings import Embeddings
 from langchain_milvus import Milvus, BM25BuiltInFunction
 from langchain_huggingface import HuggingFaceEmbeddings
 
 from app.config.config import Configuration
 
 
-config = Configuration.from_runnable_config()
-engine = create_async_engine(
-    config.database_url, connect_args={"autocommit": False}
-)
-async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
-embeddings = HuggingFaceEmbeddings(
-    model_name=config.embedding_model
+# WAL lets readers run alongside the writer and, with synchronous=NORMAL,
+# only fsyncs at checkpoints instead of on every commit
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
 )
 
 
-async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    async with engine.begin() as conn:
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+# config, engine and embedding model are built on first use, importing this
+# module (e.g. only for DocumentType) opens nothing and loads no model
+@functools.cache
+def get_config() -> Configuration:
+    return Configuration.from_runnable_config()
+
+
+@functools.cache
+def get_engine() -> AsyncEngine:
+    # leave sqlite3 in its default transaction mode: with autocommit=False a
+    # transaction is always open and the connect-time PRAGMAs are rejected
+    config = get_config()
+    url = make_url(config.database_url)
+    if url.get_backend_name() != "sqlite":
+        engine_kwargs = {
+            "pool_size": config.db_pool_size,
+            "max_overflow": config.db_max_overflow,
+            "pool_pre_ping": True,
+            "pool_recycle": 1800,
+        }
+    elif url.database in (None, "", ":memory:"):
+        # every connection to :memory: is a new empty database, share one
+        engine_kwargs = {"poolclass": StaticPool}
+    else:
+        engine_kwargs = {}
+    engine = create_async_engine(url, **engine_kwargs)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+@functools.cache
+def get_async_session_maker() -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(get_engine(), expire_on_commit=False)
+
+
+def _embedding_model_kwargs(config: Configuration) -> dict:
+    import torch
+
+    device = config.embedding_device or ("cuda" if torch.cuda.is_available() else "cpu")
+    model_kwargs = {"backend": config.embedding_backend, "device": device}
+    inner_kwargs = {}
+    if config.embedding_model_file:
+        inner_kwargs["file_name"] = config.embedding_model_file
+    if config.embedding_backend == "torch" and device.startswith("cuda"):
+        inner_kwargs["torch_dtype"] = torch.float16
+    if inner_kwargs:
+        model_kwargs["model_kwargs"] = inner_kwargs
+    return model_kwargs
+
+
+@functools.cache
+def get_embeddings() -> HuggingFaceEmbeddings:
+    config = get_config()
+    return HuggingFaceEmbeddings(
+        model_name=config.embedding_model,
+        model_kwargs=_embedding_model_kwargs(config),
+        # normalized once at encode time, cosine scores in Milvus and the
+        # semantic cache are unaffected
+        encode_kwargs={
+            "batch_size": config.embedding_batch_size,
+            "normalize_embeddings": True,
+        },
+    )
+
+
+async def init_db() -> None:
+    """Create missing tables, run once at application startup."""
+    async with get_engine().begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    async with async_session_maker() as session:
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    async with get_async_session_maker()() as session:
         yield session
 
 
-def get_vector_store():
+# chunk id and text fields of the Milvus collection, named explicitly so
+# lookups do not depend on langchain-milvus internals
+VECTOR_PRIMARY_FIELD = "pk"
+VECTOR_TEXT_FIELD = "text"
+
+
+def get_vector_store(embedding_function: Embeddings | None = None):
+    config = get_config()
     # local mode only support SPARSE_INVERTED_INDEX SPARSE_WAND
     # local mode only support FLAT IVF_FLAT AUTOINDEX
     index_params=[{
@@ -45,22 +135,37 @@ def get_vector_store():
     },{
         "index_type": "SPARSE_INVERTED_INDEX"
     }]
+    search_params = None
     if not config.vector_store_uri.endswith("db"):
         index_params = [{
             "metric_type": "COSINE",
             "index_type": "HNSW",
+            "params": {
+                "M": config.hnsw_m,
+                "efConstruction": config.hnsw_ef_construction,
+            },
         },{
             "metric_type": "BM25",
             "index_type": "AUTOINDEX",
         }]
+        search_params = [{
+            "metric_type": "COSINE",
+            "params": {"ef": config.hnsw_ef_search},
+        },{
+            "metric_type": "BM25",
+            "params": {},
+        }]
     vector_store = Milvus(
-        embedding_function=embeddings,
+        embedding_function=embedding_function or get_embeddings(),
         connection_args={"uri": config.vector_store_uri},
         builtin_function=BM25BuiltInFunction(),
         vector_field=["dense", "sparse"],
+        primary_field=VECTOR_PRIMARY_FIELD,
+        text_field=VECTOR_TEXT_FIELD,
         auto_id=True,
         drop_old=False,
         index_params=index_params,
+        search_params=search_params,
     )
     return vector_store
 
@@ -77,7 +182,8 @@ class BaseModel(Base):
     __abstract__ = True
     __allow_unmapped__ = True
 
-    id = Column(Integer, primary_key=True, index=True)
+    # the primary key is already indexed, no separate ix_<table>_id
+    id = Column(Integer, primary_key=True)
 
 
 class TimestampMixin:
@@ -99,7 +205,8 @@ class Document(BaseModel, TimestampMixin):
     document_metadata = Column(JSON, nullable=True)
 
     content = Column(Text, nullable=False)
-    content_hash = Column(String, nullable=False, index=True, unique=True)
-    unique_identifier_hash = Column(String, nullable=True, index=True, unique=True)
+    # SHA-256 hex digests. index=True with unique=True emits a single unique index
+    content_hash = Column(String(64), nullable=False, index=True, unique=True)
+    unique_identifier_hash = Column(String(64), nullable=True, index=True, unique=True)
 
     related_chunks = Column(JSON, nullable=True)
\ No newline at end of file
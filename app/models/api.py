@@ -11,6 +11,8 @@ T = TypeVar("T")
 class PaginatedResponse[T](BaseModel):
     items: list[T]
     total: int
+    # offset of the next page, None when there are no more items
+    next_cursor: int | None = None
 
 
 class DocumentRead(BaseModel):
@@ -19,4 +21,8 @@ class DocumentRead(BaseModel):
     document_type: DocumentType
     document_metadata: dict
     content: str  # Changed to string to match frontend
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+
+class DocumentBulkDelete(BaseModel):
+    ids: list[int]
@@ -1,4 +1,6 @@
 import hashlib
+import functools
+from collections.abc import Iterable
 
 from app.db import DocumentType
 
@@ -8,10 +10,37 @@ def generate_content_hash(content: str) -> str:
     return hashlib.sha256(content.encode("utf-8")).hexdigest()
 
 
+def generate_content_hashes(contents: Iterable[str]) -> list[str]:
+    """Generate SHA-256 hashes for many contents, in input order.
+
+    Hashed inline: hashlib only releases the GIL for buffers over 2047 bytes,
+    chunks are smaller, so threads would only add scheduling overhead.
+    """
+    sha256 = hashlib.sha256
+    return [sha256(content.encode("utf-8")).hexdigest() for content in contents]
+
+
+def generate_joined_content_hash(contents: Iterable[str], separator: str) -> str:
+    """Generate SHA-256 hash of separator.join(contents) without building the joined string."""
+    hasher = hashlib.sha256()
+    encoded_separator = separator.encode("utf-8")
+    for i, content in enumerate(contents):
+        if i:
+            hasher.update(encoded_separator)
+        hasher.update(content.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+@functools.cache
+def _unique_identifier_prefix(document_type: DocumentType) -> bytes:
+    return f"{document_type.value}:".encode("utf-8")
+
+
 def generate_unique_identifier_hash(
     document_type: DocumentType,
     unique_identifier: str,
 ) -> str:
     """Generate SHA-256 hash for a unique document identifier."""
-    combined_data = f"{document_type.value}:{unique_identifier}"
-    return hashlib.sha256(combined_data.encode("utf-8")).hexdigest()
\ No newline at end of file
+    hasher = hashlib.sha256(_unique_identifier_prefix(document_type))
+    hasher.update(unique_identifier.encode("utf-8"))
+    return hasher.hexdigest()
@@ -1,3 +1,5 @@
+import asyncio
+
 import httpx
 from collections.abc import AsyncGenerator
 from a2a.client import A2ACardResolver, A2AClient
@@ -16,18 +18,43 @@ from a2a.utils.constants import (
 
 
 class RemoteAgentConnection:
-    def __init__(self, agent_url: str, agent_card_path: str = None, timeout: int = 60):
-        self._httpx_client = httpx.AsyncClient(timeout=timeout)
+    def __init__(
+        self,
+        agent_url: str,
+        agent_card_path: str = None,
+        timeout: int = 60,
+        max_connections: int = 10,
+    ):
+        self._httpx_client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections * 2,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60,
+            ),
+        )
         self.agent_url = agent_url
         self.agent_card_path = agent_card_path if agent_card_path else AGENT_CARD_WELL_KNOWN_PATH
         self.initialized = False
+        # concurrent first callers must resolve the agent card only once
+        self._init_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "RemoteAgentConnection":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._httpx_client.aclose()
 
     async def initialize(self):
-        if not self.initialized:
-            card_resolver = A2ACardResolver(self._httpx_client, self.agent_url, self.agent_card_path)
-            self.card = await card_resolver.get_agent_card()
-            self.client = A2AClient(self._httpx_client, self.card, url=self.card.url)
-            self.initialized = True
+        async with self._init_lock:
+            if not self.initialized:
+                card_resolver = A2ACardResolver(self._httpx_client, self.agent_url, self.agent_card_path)
+                self.card = await card_resolver.get_agent_card()
+                self.client = A2AClient(self._httpx_client, self.card, url=self.card.url)
+                self.initialized = True
     
     async def send_message(self, request: SendMessageRequest) -> SendMessageResponse:
         if not self.initialized:
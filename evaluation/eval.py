@@ -1,7 +1,12 @@
 import os
+import csv
 import uuid
 import asyncio
+import functools
 import logging
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, Optional
@@ -20,18 +25,34 @@ from a2a.types import (
     MessageSendParams,
     Task,
     Message,
+    Part,
+    Role,
+    TextPart,
 )
 from a2a.utils.message import get_message_text
 from a2a.utils.artifact import get_artifact_text
 
-from app.db import get_vector_store
+from sqlalchemy import insert, select
+
+from app.db import (
+    Document as DocumentRecord,
+    DocumentType,
+    get_async_session_maker,
+    get_embeddings,
+    get_engine,
+    get_vector_store,
+    init_db,
+)
+from app.utils import generate_content_hashes
 from evaluation.a2a_client import RemoteAgentConnection
 
 
 # Load environment variables
 load_dotenv(".env")
-# semaphore to limit concurrent requests, llm has rate limit
-# semaphore = asyncio.Semaphore(2)
+# experiment.arun schedules every row at once, bound how many are in flight
+# since the llm has a rate limit
+CONCURRENCY = int(os.environ.get("EVAL_CONCURRENCY", "8"))
+semaphore = asyncio.Semaphore(CONCURRENCY)
 
 # Set up logging
 logging.basicConfig(
@@ -49,17 +70,25 @@ def create_ragas_dataset(dataset_path: Path = Path("evaluation/data/hf_doc_qa_ev
     """Create a Ragas Dataset from the downloaded CSV file."""
     dataset = Dataset(name="hf_doc_qa_eval", backend="local/csv", root_dir=".")
 
-    import pandas as pd
-    df = pd.read_csv(dataset_path)
-
-    for _, row in df.iterrows():
-        dataset.append({"question": row["question"], "expected_answer": row["expected_answer"]})
+    # the QA file is small, csv is much cheaper than importing pandas for it
+    sample_count = 0
+    with open(dataset_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            dataset.append({"question": row["question"], "expected_answer": row["expected_answer"]})
+            sample_count += 1
 
     dataset.save()
-    logger.info(f"Created Ragas dataset with {len(df)} samples")
+    logger.info(f"Created Ragas dataset with {sample_count} samples")
     return dataset
 
 
+_MLFLOW_TRACE_QUERY_PREFIX = (
+    "searchFilter=&orderByKey=attributes.start_time&orderByAsc=false&"
+    "startTime=ALL&lifecycleFilter=Active&modelVersionFilter=All+Runs&"
+    "datasetsFilter=W10%3D&compareRunsMode=TRACES&"
+)
+
+
 def construct_mlflow_trace_url(trace_id: str, mlflow_host: str = "http://127.0.0.1:5000") -> str:
     """
     Construct MLflow trace URL for easy access to trace details.
@@ -71,14 +100,7 @@ def construct_mlflow_trace_url(trace_id: str, mlflow_host: str = "http://127.0.0
     Returns:
         Full MLflow trace URL
     """
-    base_url = f"{mlflow_host}/#/experiments/0"
-    query_params = (
-        "searchFilter=&orderByKey=attributes.start_time&orderByAsc=false&"
-        "startTime=ALL&lifecycleFilter=Active&modelVersionFilter=All+Runs&"
-        "datasetsFilter=W10%3D&compareRunsMode=TRACES&"
-        f"selectedEvaluationId={trace_id}"
-    )
-    return f"{base_url}?{query_params}"
+    return f"{mlflow_host}/#/experiments/0?{_MLFLOW_TRACE_QUERY_PREFIX}selectedEvaluationId={trace_id}"
 
 
 # Define correctness metric
@@ -116,30 +138,26 @@ async def evaluate_rag(row: Dict[str, Any], llm, conn: RemoteAgentConnection) ->
     """
     question = row["question"]
 
-    # Query the RAG system
-    # TODO: Query the RAG system
-    initial_request = {
-        "message": {
-            "role": "user",
-            "parts": [
-                {"kind": "text", "text": question}
-            ],
-            "message_id": str(uuid.uuid4()),
-        },
-    }
-    #async with semaphore:
-    rag_response = await conn.send_message(
-        SendMessageRequest(
-            id=str(uuid.uuid4()),
-            params=MessageSendParams(**initial_request)
-        )
+    # Query the RAG system. The request is built with model_construct, the
+    # fields are known valid and per row validation of the nested models is skipped
+    request = SendMessageRequest.model_construct(
+        id=uuid.uuid4().hex,
+        params=MessageSendParams.model_construct(
+            message=Message.model_construct(
+                role=Role.user,
+                parts=[Part(root=TextPart(text=question))],
+                message_id=uuid.uuid4().hex,
+            ),
+        ),
     )
+    async with semaphore:
+        rag_response = await conn.send_message(request)
     if isinstance(rag_response.root, SendMessageSuccessResponse):
         if isinstance(rag_response.root.result, Task):
             if len(rag_response.root.result.artifacts) > 0:
                 last = rag_response.root.result.artifacts[-1]
                 rag_response = {
-                    "answer" : get_artifact_text(last)
+                    "answer" : get_artifact_text(last, delimiter="")
                 }
         elif isinstance(rag_response.root.result, Message):
             rag_response = {
@@ -153,12 +171,13 @@ async def evaluate_rag(row: Dict[str, Any], llm, conn: RemoteAgentConnection) ->
     response = rag_response.get("answer", "")
 
     # Evaluate correctness asynchronously
-    score = await correctness_metric.ascore(
-        question=question,
-        expected_answer=row["expected_answer"],
-        response=response,
-        llm=llm
-    )
+    async with semaphore:
+        score = await correctness_metric.ascore(
+            question=question,
+            expected_answer=row["expected_answer"],
+            response=response,
+            llm=llm
+        )
 
     # Get trace ID and construct trace URL
     trace_id = rag_response.get("mlflow_trace_id", "N/A")
@@ -173,8 +192,8 @@ async def evaluate_rag(row: Dict[str, Any], llm, conn: RemoteAgentConnection) ->
         "mlflow_trace_id": trace_id,
         "mlflow_trace_url": trace_url,
         "retrieved_documents": [
-            doc.get("content", "")[:200] + "..." if len(doc.get("content", "")) > 200 else doc.get("content", "")
-            for doc in rag_response.get("retrieved_documents", [])
+            content[:200] + "..." if len(content) > 200 else content
+            for content in (doc.get("content", "") for doc in rag_response.get("retrieved_documents", []))
         ]
     }
 
@@ -227,9 +246,149 @@ async def run_experiment(conn, name: Optional[str] = None):
     return experiment_results
 
 
-def chunk_list_generator(lst, chunk_size):
-    for i in range(0, len(lst), chunk_size):
-        yield lst[i:i + chunk_size]
+def split_each_document(text_splitter, documents: list[Document]) -> list[list[Document]]:
+    return [text_splitter.split_documents([doc]) for doc in documents]
+
+
+def split_documents_parallel(text_splitter, documents: list[Document]) -> list[list[Document]]:
+    """Split documents on a process pool, the splitter is pure Python and GIL bound.
+
+    Returns the chunks of each document, in document order.
+    """
+    workers = os.cpu_count() or 1
+    shard_size = max(1, -(-len(documents) // (workers * 4)))
+    # spawn, not fork: the event loop, aiosqlite and tokenizer threads are already running
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        return list(itertools.chain.from_iterable(pool.map(
+            functools.partial(split_each_document, text_splitter),
+            itertools.batched(documents, shard_size),
+        )))
+
+
+# smaller batches fill the embed/insert pipeline sooner and bound peak memory
+INGEST_BATCH_SIZE = 256
+
+
+def ingest_chunks(vector_store, chunks: list[Document]) -> list:
+    """Insert chunks into the vector store, embedding batch N+1 while batch N is inserted.
+
+    Returns the ids of the inserted chunks, in chunk order.
+    """
+    def embed(batch):
+        return pool.submit(get_embeddings().embed_documents, [chunk.page_content for chunk in batch])
+
+    batches = itertools.batched(chunks, INGEST_BATCH_SIZE)
+    chunk_ids = []
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        batch = next(batches, None)
+        pending = embed(batch) if batch else None
+        while batch is not None:
+            next_batch = next(batches, None)
+            vectors = pending.result()
+            if next_batch is not None:
+                pending = embed(next_batch)
+            related_chunks = vector_store.add_embeddings(
+                texts=[chunk.page_content for chunk in batch],
+                embeddings=vectors,
+                metadatas=[chunk.metadata for chunk in batch],
+            )
+            chunk_ids += related_chunks
+            print(f"Process: {len(chunk_ids)*100/float(len(chunks)):.1f}%, added {len(related_chunks)} chunks to vector store.")
+            batch = next_batch
+    return chunk_ids
+
+
+# hashes per IN (...) query, well below SQLite's bound parameter limit
+HASH_LOOKUP_BATCH_SIZE = 1000
+
+
+async def filter_new_documents(documents: list[Document]) -> dict[str, Document]:
+    """Return content hash -> document for documents not ingested by an earlier run."""
+    hashes = generate_content_hashes(doc.page_content for doc in documents)
+    existing = set()
+    async with get_async_session_maker()() as session:
+        for batch in itertools.batched(hashes, HASH_LOOKUP_BATCH_SIZE):
+            result = await session.execute(
+                select(DocumentRecord.content_hash).where(DocumentRecord.content_hash.in_(batch))
+            )
+            existing.update(result.scalars())
+
+    new_documents = {}
+    for content_hash, doc in zip(hashes, documents):
+        if content_hash not in existing:
+            new_documents.setdefault(content_hash, doc)
+    return new_documents
+
+
+async def record_ingested_documents(
+    documents: dict[str, Document], related_chunks: dict[str, list]
+) -> None:
+    """Store ingested documents and their chunk ids in one executemany insert.
+
+    The chunk ids let the documents page delete a record's vectors with it.
+    """
+    if not documents:
+        return
+    async with get_async_session_maker()() as session:
+        await session.execute(
+            insert(DocumentRecord),
+            [
+                {
+                    "title": doc.metadata["source"],
+                    "document_type": DocumentType.MARKDOWN,
+                    "content": doc.page_content,
+                    "content_hash": content_hash,
+                    "document_metadata": doc.metadata,
+                    "related_chunks": related_chunks[content_hash],
+                }
+                for content_hash, doc in documents.items()
+            ],
+        )
+        await session.commit()
+
+
+async def ingest_documents(source_documents: list[Document]) -> None:
+    await init_db()
+    try:
+        new_documents = await filter_new_documents(source_documents)
+        logger.info(
+            f"{len(source_documents) - len(new_documents)} of {len(source_documents)} documents already ingested"
+        )
+        if not new_documents:
+            return
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1024,
+            chunk_overlap=100,
+            length_function=len
+        )
+        document_chunks = split_documents_parallel(text_splitter, list(new_documents.values()))
+        # identical chunks only need to be embedded and stored once; the first
+        # document that yields a chunk owns it, so every vector has one record
+        hashes = iter(generate_content_hashes(
+            chunk.page_content for chunks in document_chunks for chunk in chunks
+        ))
+        seen = set()
+        owned_chunks = []
+        for chunks in document_chunks:
+            owned = []
+            for chunk, chunk_hash in zip(chunks, hashes):
+                if chunk_hash not in seen:
+                    seen.add(chunk_hash)
+                    owned.append(chunk)
+            owned_chunks.append(owned)
+        chunk_ids = iter(ingest_chunks(
+            get_vector_store(), list(itertools.chain.from_iterable(owned_chunks))
+        ))
+        related_chunks = {
+            content_hash: list(itertools.islice(chunk_ids, len(owned)))
+            for content_hash, owned in zip(new_documents, owned_chunks)
+        }
+        await record_ingested_documents(new_documents, related_chunks)
+    finally:
+        # the pooled connections belong to this event loop
+        await get_engine().dispose()
 
 
 if __name__ == "__main__":
@@ -237,25 +396,21 @@ if __name__ == "__main__":
     init_data = os.environ.get("INIT_DATA", "false") == "true"
     if init_data:
         import pandas as pd
-        df = pd.read_csv(dataset_path := Path("evaluation/data/huggingface_doc.csv"))
+        df = pd.read_csv(
+            Path("evaluation/data/huggingface_doc.csv"),
+            usecols=["text", "source"],
+            dtype="string",
+            engine="pyarrow",
+        )
         source_documents = [
-            Document(
-                page_content=row["text"],
-                metadata={"source": row["source"].split("/")[1]},
-            )
-            for _, row in df.iterrows()
+            Document(page_content=text, metadata={"source": source.split("/", 2)[1]})
+            for text, source in zip(df["text"].to_numpy(), df["source"].to_numpy())
         ]
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1024,
-            chunk_overlap=100,
-            length_function=len
-        )
-        chunks = text_splitter.split_documents(source_documents)
-        vector_store = get_vector_store()
+        asyncio.run(ingest_documents(source_documents))
 
-        for small_chunks in chunk_list_generator(chunks, 1000):
-            related_chunks = vector_store.add_documents(small_chunks)
-            print(f"Process: {len(small_chunks)*100/float(len(chunks))}%, added {len(related_chunks)} chunks to vector store.")
+    async def main():
+        # the connection's HTTP client is closed even if the experiment fails
+        async with RemoteAgentConnection("http://localhost:8000/a2a", max_connections=CONCURRENCY) as conn:
+            await run_experiment(conn)
 
-    conn = RemoteAgentConnection("http://localhost:8000/a2a")
-    asyncio.run(run_experiment(conn))
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,31 @@
+"""Export the embedding model to ONNX and quantize it to int8.
+
+Usage:
+    python scripts/export_onnx_embedding.py [model_name] [output_dir] [config]
+
+config is one of "avx512_vnni" (default), "avx512", "avx2" or "arm64". Then set
+EMBEDDING_MODEL=<output_dir>, EMBEDDING_BACKEND=onnx and
+EMBEDDING_MODEL_FILE=onnx/model_qint8_<config>.onnx in run.sh.
+
+Requires `pip install "sentence-transformers[onnx]"` (optimum + onnxruntime).
+"""
+import sys
+
+from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+from app.config.config import DEFAULT_EMBEDDING_MODEL
+
+
+def main(model_name: str, output_dir: str, quantization_config: str) -> None:
+    model = SentenceTransformer(model_name, backend="onnx")
+    model.save_pretrained(output_dir)
+    export_dynamic_quantized_onnx_model(model, quantization_config, output_dir)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(
+        args[0] if len(args) > 0 else DEFAULT_EMBEDDING_MODEL,
+        args[1] if len(args) > 1 else "bge-m3-onnx",
+        args[2] if len(args) > 2 else "avx512_vnni",
+    )
@@ -1,7 +1,16 @@
 import streamlit as st
 import json
+import orjson
+import os
 import uuid
+import collections
+import contextlib
+import itertools
 import requests
+from requests.adapters import HTTPAdapter
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Iterator
 import time
 
@@ -21,25 +30,135 @@ if "api_base" not in st.session_state:
 if "current_response" not in st.session_state:
     st.session_state.current_response = ""
 
+
+# one pool for the whole process: reruns, browser tabs and reconnects all reuse
+# warm keep-alive connections. The API sets no cookies, so sharing is safe
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Return the process-wide pooled HTTP session, keep-alive saves a handshake per call."""
+    session = requests.Session()
+    session.headers.update({"Accept": "application/json"})
+    # urllib3 does not retry POST by default, so chat messages are never re-sent
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(total=2, backoff_factor=0.2),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# pages fetched for the document list, the first one plus up to
+# PREFETCH_PAGES - 1 more in parallel
+PREFETCH_PAGES = 4
+
+
+def _get_documents_page(session: requests.Session, api_base: str, skip: int, page_size: int, document_types: Optional[str]) -> dict:
+    params = {
+        "skip": skip,
+        "page_size": page_size,
+    }
+    if document_types:
+        params["document_types"] = document_types
+    response = session.get(
+        f"{api_base}/api/v1/documents/",
+        params=params,
+        timeout=10
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+# cached across reruns and sessions: typing in the search box reruns the script
+# but only filters client side. Failures raise, so they are never cached.
+# _session is not part of the cache key
+@st.cache_data(ttl=30, max_entries=32, show_spinner=False)
+def _fetch_documents(_session: requests.Session, api_base: str, page_size: int, document_types: Optional[str]) -> dict:
+    first = _get_documents_page(_session, api_base, 0, page_size, document_types)
+    total = first.get("total", 0)
+    skips = range(page_size, min(total, page_size * PREFETCH_PAGES), page_size)
+    items = first.get("items", [])
+    if skips:
+        # the pooled session keeps several connections open, so the remaining
+        # pages cost about one round trip together
+        with ThreadPoolExecutor(max_workers=len(skips)) as executor:
+            pages = list(executor.map(
+                lambda skip: _get_documents_page(_session, api_base, skip, page_size, document_types),
+                skips,
+            ))
+        items = list(itertools.chain(items, *(page["items"] for page in pages)))
+    # lowercased once per fetch, the search box only runs substring checks.
+    # Kept beside the items so document details stay as the API returned them
+    titles = [doc.get('title', 'Unknown').lower() for doc in items]
+    return {"items": items, "total": total, "titles": titles}
+
+
+# repeated clicks within a few seconds reuse the last answer, connection
+# errors raise and are never cached
+@st.cache_data(ttl=5, show_spinner=False)
+def _check_connection(_session: requests.Session, api_base: str) -> int:
+    response = _session.get(
+        f"{api_base}/api/v1/documents/",
+        params={"page_size": 1},
+        timeout=5
+    )
+    return response.status_code
+
+
+UUID_POOL_SIZE = 64
+
+
+# the script module is re-executed on every rerun, keep the pool in a resource
+@st.cache_resource
+def _uuid_pool() -> collections.deque:
+    return collections.deque()
+
+
+def next_uuid() -> str:
+    """Return a random (version 4) UUID hex, drawn from os.urandom in batches."""
+    pool = _uuid_pool()
+    try:
+        return pool.popleft()
+    except IndexError:
+        buf = os.urandom(16 * UUID_POOL_SIZE)
+        ids = [uuid.UUID(bytes=buf[i:i + 16], version=4).hex for i in range(0, len(buf), 16)]
+        pool.extend(ids[1:])
+        return ids[0]
+
+
+# files at least this large are uploaded as UPLOAD_CHUNK_SIZE byte ranges,
+# UPLOAD_PARALLEL at a time so the transfer is spread over several connections
+CHUNKED_UPLOAD_MIN_SIZE = 16 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_PARALLEL = 4
+
+
 class DocumentManager:
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, session: requests.Session):
         self.base_url = base_url
+        self.session = session
     
     def upload_document(self, file, document_type: Optional[str] = None):
         """upload document"""
-        files = {"files": (file.name, file.getvalue(), file.type)}
-        data = {}
+        # stream the multipart body from the file handle instead of copying
+        # the file into bytes and building the whole body in memory
+        file.seek(0)
+        fields = {"files": (file.name, file, file.type)}
         if document_type:
-            data["document_type"] = document_type
-            
+            fields["document_type"] = document_type
+        encoder = MultipartEncoder(fields=fields)
+
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/v1/documents/fileupload",
-                files=files,
-                data=data,
-                timeout=30
+                data=encoder,
+                headers={"Content-Type": encoder.content_type},
+                # large uploads are processed before the response, no read timeout
+                timeout=(10, None)
             )
             if response.status_code == 200:
+                _fetch_documents.clear()
                 return response.json()
             else:
                 st.error(f"upload document failed, status code: {response.status_code}")
@@ -48,26 +167,57 @@ class DocumentManager:
             st.error(f"upload document failed: {str(e)}")
             return None
     
-    def list_documents(self, skip: int = 0, page_size: int = 50, document_types: Optional[str] = None):
-        """list documents"""
-        params = {
-            "skip": skip,
-            "page_size": page_size,
-        }
-        if document_types:
-            params["document_types"] = document_types
-            
-        try:
-            response = requests.get(
-                f"{self.base_url}/api/v1/documents/", 
-                params=params,
-                timeout=10
+    def upload_document_chunked(self, file, document_type: Optional[str] = None,
+                                chunk_size: int = UPLOAD_CHUNK_SIZE, parallel: int = UPLOAD_PARALLEL):
+        """upload document in byte ranges over several connections, small files in one request"""
+        if file.size < CHUNKED_UPLOAD_MIN_SIZE:
+            return self.upload_document(file, document_type)
+
+        upload_id = next_uuid()
+        total = file.size
+
+        def post_chunk(view: memoryview, offset: int) -> dict:
+            end = min(offset + chunk_size, total) - 1
+            response = self.session.post(
+                f"{self.base_url}/api/v1/documents/chunk",
+                params={"file_name": file.name},
+                data=bytes(view[offset:end + 1]),
+                headers={
+                    "Content-Type": "application/octet-stream",
+                    "Content-Range": f"bytes {offset}-{end}/{total}",
+                    "Upload-Id": upload_id,
+                },
+                # the last chunk waits for the file to be processed
+                timeout=(10, None)
             )
-            if response.status_code == 200:
-                return response.json()
-            else:
-                st.error(f"list documents failed, status code: {response.status_code}")
-                return None
+            response.raise_for_status()
+            return response.json()
+
+        try:
+            # UploadedFile is a BytesIO, slice its buffer instead of copying
+            # the whole file; at most `parallel` chunks are held at once
+            with file.getbuffer() as view, ThreadPoolExecutor(max_workers=parallel) as executor:
+                results = list(executor.map(lambda offset: post_chunk(view, offset), range(0, total, chunk_size)))
+        except requests.exceptions.HTTPError as e:
+            # the server runs several workers and cannot assemble chunks
+            if e.response.status_code == 501:
+                return self.upload_document(file, document_type)
+            st.error(f"upload document failed, status code: {e.response.status_code}")
+            return None
+        except Exception as e:
+            st.error(f"upload document failed: {str(e)}")
+            return None
+        _fetch_documents.clear()
+        # only the chunk that completed the file carries the processing result
+        return next((result for result in results if "processed" in result), results[-1])
+    
+    def list_documents(self, page_size: int = 50, document_types: Optional[str] = None):
+        """list documents, the first PREFETCH_PAGES pages merged into one"""
+        try:
+            return _fetch_documents(self.session, self.base_url, page_size, document_types)
+        except requests.exceptions.HTTPError as e:
+            st.error(f"list documents failed, status code: {e.response.status_code}")
+            return None
         except Exception as e:
             st.error(f"list documents failed: {str(e)}")
             return None
@@ -75,104 +225,172 @@ class DocumentManager:
     def delete_document(self, document_id: int):
         """delete document"""
         try:
-            response = requests.delete(
+            response = self.session.delete(
                 f"{self.base_url}/api/v1/documents/{document_id}",
                 timeout=10
             )
-            return response.status_code == 200
+            if response.status_code == 200:
+                _fetch_documents.clear()
+                return True
+            return False
         except Exception as e:
             st.error(f"delete document failed: {str(e)}")
             return False
 
 
-def parse_sse_line(line):
+def parse_sse_line(line: bytes):
     """
-    Parse a single line from an SSE stream.
+    Parse a single line from an SSE stream, only data lines are consumed.
     event: message
     data: {"content": "Hello"}
-    
-    event: error
-    data: {"error": "Something went wrong"}
+
+    empty separator lines, event: lines and : keep-alive comments return None
     """
-    line = line.strip()
-    if not line:
+    if not line.startswith(b"data:"):
         return None
-    
-    # "field: value"
-    if ':' in line:
-        field, value = line.split(':', 1)
-        field = field.strip()
-        value = value.strip()
-        
-        if field == 'data':
-            try:
-                return json.loads(value)
-            except json.JSONDecodeError:
-                return {"raw_data": value}
-        elif field == 'event':
-            return {"event_type": value}
-    
-    return None
+    # orjson parses the bytes directly and skips surrounding whitespace (and a
+    # trailing \r) itself, only the fallback needs the value stripped
+    value = line[5:]
+    try:
+        return orjson.loads(value)
+    except orjson.JSONDecodeError:
+        return {"raw_data": value.strip().decode("utf-8", errors="replace")}
+
+
+# retried before anything is streamed back: connection failures and gateway
+# errors. read=0 so a dropped stream is never replayed as a second message
+A2A_RETRY = Retry(
+    total=3,
+    connect=3,
+    read=0,
+    backoff_factor=0.3,
+    status_forcelist=(502, 503, 504),
+    allowed_methods=frozenset(["POST"]),
+)
+
+
+# upper bound per socket read of the reply stream
+SSE_READ_SIZE = 65536
 
 
 class ChatClient:
-    def __init__(self, base_url: str):
-        pass
+    HEADERS = {
+        'Content-Type': 'application/json',
+        'Accept': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+    }
+    # the message/stream JSON-RPC envelope serialized once, per message only
+    # the ids (bare hex, nothing to escape) and the JSON-encoded text are
+    # spliced in
+    PAYLOAD_TEMPLATE = (
+        b'{"id":"%b","jsonrpc":"2.0","method":"message/stream","params":{"message":{'
+        b'"contextId":"%b","kind":"message","messageId":"%b",'
+        b'"parts":[{"kind":"text","text":%b}],"role":"agent"}}}'
+    )
+
+    def __init__(self, base_url: str, session: requests.Session):
+        self.base_url = base_url
+        self.session = session
+        self.stream_url = f"{base_url}/a2a"
+        # longest prefix wins, so only /a2a gets POST retries. Uploads stream
+        # their body and cannot be re-sent
+        if self.stream_url not in session.adapters:
+            session.mount(
+                self.stream_url,
+                HTTPAdapter(pool_connections=1, pool_maxsize=20, max_retries=A2A_RETRY),
+            )
     
     def send_message_stream(self, message: str, **kwargs) -> Iterator[str]:
         """send message stream"""
         try:
-            headers = {
-                'Content-Type': 'application/json',
-                'Accept': 'text/event-stream',
-                'Cache-Control': 'no-cache',
-            }
-            payload = {
-                "id": str(uuid.uuid4()),
-                "jsonrpc": "2.0",
-                "method": "message/stream",
-                "params": {
-                    "message": {
-                        "contextId": st.session_state.context_id,
-                        "kind": "message",
-                        "messageId": "string",
-                        "parts": [{
-                            "kind": "text",
-                            "text": message
-                        }],
-                        "role": "agent",
-                    },
-                }
-            }
-            response = requests.post(
-                f"{st.session_state.api_base}/a2a",
-                headers=headers,
-                data=json.dumps(payload),
+            payload = self.PAYLOAD_TEMPLATE % (
+                next_uuid().encode(),
+                st.session_state.context_id.encode(),
+                next_uuid().encode(),
+                # compact UTF-8 bytes instead of \uXXXX escapes, non-ASCII
+                # text is half the size or less on the wire
+                orjson.dumps(message),
+            )
+            response = self.session.post(
+                self.stream_url,
+                headers=self.HEADERS,
+                data=payload,
                 stream=True,
-                timeout=30
+                # the first token can take longer than any fixed read timeout
+                # (rewrite + retrieval), only bound the connect
+                timeout=(10, None)
             )
-            response.raise_for_status()
-            for line in response.iter_lines(decode_unicode=True):
-                if line:
-                    event_data = parse_sse_line(line)
-                    if event_data and isinstance(event_data, dict):  
-                        if "result" in event_data:
-                            if "artifact" in event_data["result"]:
-                                if "parts" in event_data["result"]["artifact"]:
-                                    for part in event_data["result"]["artifact"]["parts"]:
-                                        if part["kind"] == "text":
-                                            yield part["text"]
-  
+            # closed on every exit, including the generator being closed when
+            # the user moves on mid-reply, so the server sees the disconnect
+            # and stops generating
+            try:
+                response.raise_for_status()
+                # split raw bytes on newlines ourselves, nothing is decoded
+                # except the JSON payload of data lines. read1 returns whatever
+                # has arrived (one chunk of the chunked body) without waiting
+                # for a full read size, and skips iter_content's generator
+                raw = response.raw
+                raw.decode_content = True
+                # read1 is urllib3 2.x only, 1.26 falls back to iter_content,
+                # which also yields data as it arrives without a chunk size
+                read1 = getattr(raw, "read1", None)
+                chunks = (
+                    iter(lambda: read1(SSE_READ_SIZE), b"")
+                    if read1 else response.iter_content(chunk_size=None)
+                )
+                buffer = bytearray()
+                for chunk in chunks:
+                    buffer += chunk
+                    # walk the lines by offset and drop the consumed prefix once
+                    # per chunk, not once per line
+                    start = 0
+                    while (newline := buffer.find(b"\n", start)) != -1:
+                        # blank separators and event: lines are skipped in place,
+                        # without copying them out of the buffer
+                        if not buffer.startswith(b"data:", start, newline):
+                            start = newline + 1
+                            continue
+                        line = bytes(buffer[start:newline])
+                        start = newline + 1
+                        event_data = parse_sse_line(line)
+                        if not isinstance(event_data, dict):
+                            continue
+                        result = event_data.get("result")
+                        if not result:
+                            continue
+                        parts = (result.get("artifact") or {}).get("parts")
+                        if not parts:
+                            continue
+                        for part in parts:
+                            if part.get("kind") == "text":
+                                yield part["text"]
+                    del buffer[:start]
+            finally:
+                response.close()
+
         except requests.exceptions.Timeout:
             yield "error: timeout"
         except Exception as e:
             yield f"error: {str(e)}"
 
 
+# the clients hold no per-user state, one per API base for the whole process
+@st.cache_resource(max_entries=8)
+def get_doc_manager(api_base: str) -> DocumentManager:
+    return DocumentManager(api_base, get_http_session())
+
+
+@st.cache_resource(max_entries=8)
+def get_chat_client(api_base: str) -> ChatClient:
+    return ChatClient(api_base, get_http_session())
+
+
+# a fragment: searching, filtering and viewing rerun only the document pages
+@st.fragment
 def render_document_management():
     st.header("📁 document management")
     
-    doc_manager = DocumentManager(st.session_state.api_base)
+    doc_manager = get_doc_manager(st.session_state.api_base)
     
     # 创建标签页
     tab1, tab2 = st.tabs(["📤 upload document", "📋 document list"])
@@ -196,7 +414,7 @@ def render_document_management():
         
         if st.button("📤 upload document", type="primary", use_container_width=True) and uploaded_file:
             with st.spinner("uploading..."):
-                result = doc_manager.upload_document(
+                result = doc_manager.upload_document_chunked(
                     uploaded_file, 
                     doc_type if doc_type else None
                 )
@@ -226,6 +444,7 @@ def render_document_management():
             )
         with col3:
             if st.button("🔄 refresh list", use_container_width=True):
+                _fetch_documents.clear()
                 st.rerun()
         
         # fetch document list
@@ -234,15 +453,22 @@ def render_document_management():
                 document_types=doc_type_filter if doc_type_filter != "all types" else None
             )
         
-        if documents and "items" in documents and len(documents["items"]) > 0:
-            st.info(f"📊 found {len(documents['items'])} documents")
+        items = documents.get("items") if documents else None
+        if items:
+            # filter by document name before emitting any widgets
+            term = search_term.lower() if search_term else None
+            if term:
+                filtered = [doc for doc, title in zip(items, documents["titles"]) if term in title]
+            else:
+                filtered = items
+            n = len(filtered)
+            st.info(f"📊 found {n} documents")
             
-            for i, doc in enumerate(documents["items"]):
-                # filter document name
+            for i, doc in enumerate(filtered):
                 doc_name = doc.get('title', 'Unknown')
-                if search_term and search_term.lower() not in doc_name.lower():
-                    continue
-                    
+                doc_id = doc.get('id', 'N/A')
+                did = str(doc_id)
+                view_k, del_k, close_k, state_k = "view_" + did, "delete_" + did, "close_" + did, "view_doc_" + did
                 with st.container():
                     col1, col2, col3, col4 = st.columns([4, 2, 1, 1])
                     
@@ -261,31 +487,34 @@ def render_document_management():
                                 st.caption(f"📦 size: {doc['size']}")
                     
                     with col2:
-                        doc_id = doc.get('id', 'N/A')
                         st.code(f"ID: {doc_id}")
                     
                     with col3:
-                        if st.button("👁️ view", key=f"view_{doc_id}", use_container_width=True):
-                            st.session_state[f"view_doc_{doc_id}"] = True
+                        if st.button("👁️ view", key=view_k, use_container_width=True):
+                            # serialized once here, reruns while the details
+                            # stay open only re-send the string
+                            st.session_state[state_k] = json.dumps(doc, indent=2, ensure_ascii=False)
                     
                     with col4:
-                        if st.button("🗑️ delete", key=f"delete_{doc_id}", use_container_width=True):
+                        if st.button("🗑️ delete", key=del_k, use_container_width=True):
                             if doc_manager.delete_document(doc_id):
-                                st.success("✅ document deleted successfully!")
-                                time.sleep(1)
+                                # the toast survives the rerun, no sleep needed
+                                # to keep the message on screen
+                                st.toast("✅ document deleted successfully!")
                                 st.rerun()
                             else:
                                 st.error("❌ failed to delete document")
                     
                     # show document details
-                    if st.session_state.get(f"view_doc_{doc_id}", False):
+                    details = st.session_state.get(state_k)
+                    if details:
                         with st.expander(f"document details: {doc_name}", expanded=True):
-                            st.json(doc)
-                            if st.button("close details", key=f"close_{doc_id}"):
-                                st.session_state[f"view_doc_{doc_id}"] = False
+                            st.code(details, language="json")
+                            if st.button("close details", key=close_k):
+                                del st.session_state[state_k]
                                 st.rerun()
                     
-                    if i < len(documents["items"]) - 1:
+                    if i < n - 1:
                         st.divider()
         else:
             st.info("📭 no documents available or failed to connect to document service")
@@ -293,12 +522,43 @@ def render_document_management():
                 st.switch_page("📤 upload document")
 
 
-def render_chat_interface():
-    st.header("💬 chat")
-    
-    chat_client = ChatClient(st.session_state.api_base)
-    
-    # sidebar settings
+def build_chat_export() -> str:
+    """Build the chat export text, reused until the conversation changes."""
+    history = st.session_state.chat_history
+    key = (st.session_state.context_id, len(history))
+    cached = st.session_state.get("chat_export")
+    if cached is None or cached[0] != key:
+        chat_text = "chat history:\n\n" + "".join(
+            f"{'user' if msg['role'] == 'user' else 'assistant'}: {msg['content']}\n\n"
+            for msg in history
+        )
+        cached = st.session_state.chat_export = (key, chat_text)
+    return cached[1]
+
+
+# messages rendered per rerun, earlier ones are behind a toggle so a long
+# conversation does not re-emit every message on every interaction
+CHAT_HISTORY_WINDOW = 20
+
+
+def render_chat_message(message: dict):
+    with st.chat_message(message["role"]):
+        st.write(message["content"])
+        
+        # show timestamp if available
+        if "timestamp" in message:
+            st.caption(f"🕒 {message['timestamp']}")
+
+
+# seconds between re-renders of a streaming reply, ~20 updates per second
+RENDER_INTERVAL = 0.05
+
+
+def render_chat_settings() -> dict:
+    """Render the chat settings in the sidebar and return the generation parameters.
+
+    Kept outside the chat fragment, fragments cannot write to the sidebar.
+    """
     with st.sidebar.expander("⚙️ settings", expanded=False):
         col1, col2 = st.columns(2)
         with col1:
@@ -321,32 +581,44 @@ def render_chat_interface():
         if clear_history:
             st.session_state.chat_history = []
             st.session_state.current_response = ""
+            st.session_state.context_id = next_uuid()
             st.rerun()
         
         if export_chat:
-            # export chat history
-            chat_text = "chat history:\n\n"
-            for msg in st.session_state.chat_history:
-                role = "user" if msg["role"] == "user" else "assistant"
-                chat_text += f"{role}: {msg['content']}\n\n"
-            
             st.download_button(
                 "download chat history",
-                chat_text,
+                build_chat_export(),
                 file_name=f"chat_export_{time.strftime('%Y%m%d_%H%M%S')}.txt",
                 use_container_width=True
             )
     
-    # list chat history
+    return {
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "top_p": top_p,
+        "presence_penalty": presence_penalty,
+        # no history: the server keeps the conversation per context_id
+    }
+
+
+# a fragment: sending a message reruns only the chat, not main()'s sidebar
+# widgets. Settings changes rerun the whole app and pass new chat_params
+@st.fragment
+def render_chat_interface(chat_params: dict):
+    st.header("💬 chat")
+    
+    chat_client = get_chat_client(st.session_state.api_base)
+    
+    # list chat history, only the last CHAT_HISTORY_WINDOW messages unless
+    # the earlier ones are asked for
+    history = st.session_state.chat_history
+    earlier = len(history) - CHAT_HISTORY_WINDOW
     chat_container = st.container()
     with chat_container:
-        for i, message in enumerate(st.session_state.chat_history):
-            with st.chat_message(message["role"]):
-                st.write(message["content"])
-                
-                # show timestamp if available
-                if "timestamp" in message:
-                    st.caption(f"🕒 {message['timestamp']}")
+        if earlier > 0 and not st.toggle(f"show {earlier} earlier messages", key="show_earlier_messages"):
+            history = history[earlier:]
+        for message in history:
+            render_chat_message(message)
     
     # show current response if available
     if st.session_state.current_response:
@@ -361,14 +633,16 @@ def render_chat_interface():
         if st.button("🔄 new chat", use_container_width=True):
             st.session_state.chat_history = []
             st.session_state.current_response = ""
-            st.session_state.context_id = str(uuid.uuid4())
+            st.session_state.context_id = next_uuid()
             st.rerun()
     
     if prompt:
+        # one timestamp for the turn, shared by the question and its reply
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
         user_message = {
             "role": "user", 
             "content": prompt,
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+            "timestamp": timestamp
         }
         st.session_state.chat_history.append(user_message)
         
@@ -379,19 +653,20 @@ def render_chat_interface():
             message_placeholder = st.empty()
             full_response = ""
             
-            chat_params = {
-                "temperature": temperature,
-                "max_tokens": max_tokens,
-                "top_p": top_p,
-                "presence_penalty": presence_penalty,
-                "history": st.session_state.chat_history[:-1]  # exclude current user message
-            }
-            
             try:
-                for chunk in chat_client.send_message_stream(prompt, **chat_params):
-                    if chunk:
-                        full_response += chunk
-                        message_placeholder.markdown(full_response + "▌")
+                # coalesce tokens, re-render at most every RENDER_INTERVAL seconds
+                last_render = time.monotonic()
+                # a click on "new chat" (or anything else) stops this run at
+                # the next render, closing() then shuts the stream right away
+                # instead of whenever the generator is garbage collected
+                with contextlib.closing(chat_client.send_message_stream(prompt, **chat_params)) as stream:
+                    for chunk in stream:
+                        if chunk:
+                            full_response += chunk
+                            now = time.monotonic()
+                            if now - last_render >= RENDER_INTERVAL:
+                                message_placeholder.markdown(full_response + "▌")
+                                last_render = now
                 message_placeholder.markdown(full_response)
                 
             except Exception as e:
@@ -404,12 +679,11 @@ def render_chat_interface():
         assistant_message = {
             "role": "assistant", 
             "content": full_response,
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+            "timestamp": timestamp
         }
+        # no st.rerun() here: the turn is already rendered in place and the
+        # next chat_input submission reruns the script with it in the history
         st.session_state.chat_history.append(assistant_message)
-        
-        # scroll to bottom
-        st.rerun()
 
 
 def main():
@@ -420,19 +694,19 @@ def main():
         value=st.session_state.api_base,
         help="e.g. http://localhost:8000 or https://your-api-domain.com"
     )
-    st.session_state.context_id = str(uuid.uuid4())
+    # one context per conversation, the server keeps its history under this id;
+    # "new chat" starts a new one
+    if "context_id" not in st.session_state:
+        st.session_state.context_id = next_uuid()
     
     if st.sidebar.button("🔗 check connection", use_container_width=True):
         with st.spinner("testing connection..."):
             try:
-                response = requests.get(
-                    f"{st.session_state.api_base}/api/v1/documents/", 
-                    timeout=5
-                )
-                if response.status_code == 200:
+                status_code = _check_connection(get_http_session(), st.session_state.api_base)
+                if status_code == 200:
                     st.sidebar.success("✅ OK")
                 else:
-                    st.sidebar.error(f"❌ Connection failed: {response.status_code}")
+                    st.sidebar.error(f"❌ Connection failed: {status_code}")
             except Exception as e:
                 st.sidebar.error(f"❌ Connection error: {str(e)}")
     
@@ -472,7 +746,7 @@ def main():
     if app_mode == "📁 document management":
         render_document_management()
     else:
-        render_chat_interface()
+        render_chat_interface(render_chat_settings())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
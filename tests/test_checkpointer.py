@@ -0,0 +1,62 @@
+import unittest
+from unittest import mock
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import HumanMessage
+
+from app.agent import nodes
+from app.agent.checkpointer import BoundedInMemorySaver
+from app.agent.graph import build_graph
+
+
+class BoundedInMemorySaverTest(unittest.IsolatedAsyncioTestCase):
+    """The graph's checkpointer must not grow with turns or conversations."""
+
+    def setUp(self):
+        llm = FakeListChatModel(responses=["answer"])
+        for target in (
+            mock.patch.object(nodes, "get_llm", return_value=llm),
+            mock.patch.object(nodes, "retrieve_relevant_documents", mock.AsyncMock(return_value=[])),
+        ):
+            target.start()
+            self.addCleanup(target.stop)
+
+    async def run_turn(self, graph, thread_id: str, text: str) -> dict:
+        config = {"configurable": {"thread_id": thread_id}}
+        return await graph.ainvoke({"messages": [HumanMessage(content=text)]}, config)
+
+    async def test_keeps_only_latest_checkpoint(self):
+        saver = BoundedInMemorySaver()
+        graph = build_graph(checkpointer=saver)
+        for i in range(5):
+            await self.run_turn(graph, "t1", f"question {i}")
+
+        self.assertEqual(len(saver.storage["t1"][""]), 1)
+        latest = saver.get_tuple({"configurable": {"thread_id": "t1"}})
+        self.assertEqual(len(latest.checkpoint["channel_values"]["messages"]), 10)
+        # one blob per channel version the latest checkpoint still references
+        versions = latest.checkpoint["channel_versions"]
+        self.assertTrue(all(versions.get(key[2]) == key[3] for key in saver.blobs))
+
+    async def test_evicts_least_recently_written_thread(self):
+        saver = BoundedInMemorySaver(max_threads=2)
+        graph = build_graph(checkpointer=saver)
+        for thread_id in ("t1", "t2", "t1", "t3"):
+            await self.run_turn(graph, thread_id, "question")
+
+        self.assertIsNone(saver.get_tuple({"configurable": {"thread_id": "t2"}}))
+        self.assertIsNotNone(saver.get_tuple({"configurable": {"thread_id": "t1"}}))
+        self.assertIsNotNone(saver.get_tuple({"configurable": {"thread_id": "t3"}}))
+        self.assertFalse(any(key[0] == "t2" for key in saver.blobs))
+
+    async def test_stored_messages_capped_at_history_window(self):
+        graph = build_graph(checkpointer=BoundedInMemorySaver())
+        for i in range(nodes.MAX_HISTORY_MESSAGES):
+            state = await self.run_turn(graph, "t1", f"question {i}")
+
+        self.assertEqual(len(state["messages"]), nodes.MAX_HISTORY_MESSAGES)
+        self.assertEqual(state["messages"][-2].content, f"question {nodes.MAX_HISTORY_MESSAGES - 1}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import unittest
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import document as document_api
+
+
+TOTAL = 30
+
+
+class ChunkedUploadTest(unittest.TestCase):
+    """Chunks assemble into the original file, in any order, exactly once."""
+
+    def setUp(self):
+        app = FastAPI()
+        app.include_router(document_api.router)
+        self.client = TestClient(app)
+        self.data = os.urandom(TOTAL)
+        self.processed = []
+
+        async def process(file_path, file_name):
+            with open(file_path, "rb") as f:
+                self.processed.append((file_name, f.read()))
+
+        for target in (
+            mock.patch.object(document_api, "process_file_upload_in_new_session", process),
+            mock.patch.object(document_api, "chunked_uploads", {}),
+        ):
+            target.start()
+            self.addCleanup(target.stop)
+        self.addCleanup(self.remove_unfinished)
+
+    def remove_unfinished(self):
+        for upload in document_api.chunked_uploads.values():
+            document_api.remove_file(upload.file_path)
+
+    def send(self, start: int, end: int, upload_id: str = "u1", body: bytes | None = None):
+        return self.client.post(
+            "/documents/chunk",
+            params={"file_name": "big.pdf"},
+            content=self.data[start:end] if body is None else body,
+            headers={"Upload-Id": upload_id, "Content-Range": f"bytes {start}-{end - 1}/{TOTAL}"},
+        )
+
+    def test_out_of_order_chunks_assemble(self):
+        for start in (20, 0, 10):
+            response = self.send(start, start + 10)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["processed"], ["big.pdf"])
+        self.assertEqual(self.processed, [("big.pdf", self.data)])
+        self.assertEqual(document_api.chunked_uploads, {})
+
+    def test_overlapping_and_repeated_ranges_leave_gap_open(self):
+        # 25 bytes sent in total, but bytes 20-29 were never received
+        for start, end in ((0, 10), (0, 10), (5, 15), (10, 20)):
+            self.assertEqual(self.send(start, end).status_code, 200)
+        self.assertEqual(self.processed, [])
+        self.assertFalse(document_api.chunked_uploads["u1"].complete)
+        self.assertEqual(document_api.chunked_uploads["u1"].received_bytes, 20)
+
+        self.send(15, 30)
+        self.assertEqual(self.processed, [("big.pdf", self.data)])
+
+    def test_size_mismatch_rejected(self):
+        response = self.send(0, 10, body=b"short")
+        self.assertEqual(response.status_code, 400)
+
+    def test_oversized_body_rejected(self):
+        response = self.send(0, 10, body=self.data)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(document_api.chunked_uploads["u1"].received_bytes, 0)
+
+    def test_rejected_with_several_workers(self):
+        with mock.patch.object(document_api, "CHUNKED_UPLOADS_ENABLED", False):
+            response = self.send(0, 10)
+        self.assertEqual(response.status_code, 501)
+
+
+if __name__ == "__main__":
+    unittest.main()
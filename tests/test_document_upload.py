@@ -0,0 +1,112 @@
+import asyncio
+import io
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from fastapi import UploadFile
+from langchain_core.documents import Document
+
+from app.api import document as document_api
+
+
+class ReuploadChunkReuseTest(unittest.IsolatedAsyncioTestCase):
+    """A changed re-upload only embeds and inserts the chunks that are new."""
+
+    async def test_reuses_stored_chunks(self):
+        loader = mock.Mock(aload=mock.AsyncMock(return_value=[
+            Document(page_content="kept paragraph"),
+            Document(page_content="new paragraph"),
+        ]))
+        existing = SimpleNamespace(id=7, content_hash="outdated", related_chunks=[1, 2])
+        vector_store = mock.Mock(
+            collection_name="localrag",
+            aadd_embeddings=mock.AsyncMock(return_value=[3]),
+            adelete=mock.AsyncMock(),
+        )
+        vector_store.client.query.return_value = [
+            {"pk": 1, "text": "kept paragraph"},
+            {"pk": 2, "text": "removed paragraph"},
+        ]
+        embed_texts = mock.AsyncMock(return_value=[[0.1, 0.2]])
+        session = mock.Mock(execute=mock.AsyncMock(), commit=mock.AsyncMock())
+
+        with (
+            mock.patch.object(document_api, "UnstructuredMarkdownLoader", return_value=loader),
+            mock.patch.object(document_api, "get_document_by_unique_identifier_hash", mock.AsyncMock(return_value=existing)),
+            mock.patch.object(document_api, "get_vector_store", return_value=vector_store),
+            mock.patch.object(document_api, "embed_texts", embed_texts),
+        ):
+            await document_api.process_file_upload_task("/tmp/notes.md", "notes.md", session)
+
+        embed_texts.assert_awaited_once_with(["new paragraph"])
+        self.assertEqual(vector_store.client.query.call_args.kwargs["limit"], 2)
+        self.assertEqual(vector_store.aadd_embeddings.await_args.kwargs["texts"], ["new paragraph"])
+        vector_store.adelete.assert_awaited_once_with(ids=[2])
+        update = session.execute.await_args.args[0]
+        self.assertEqual(update.compile().params["related_chunks"], [1, 3])
+
+
+class StoredChunkLookupTest(unittest.IsolatedAsyncioTestCase):
+    """Stored chunks are looked up in bounded batches."""
+
+    async def test_ids_are_queried_in_batches(self):
+        vector_store = mock.Mock(collection_name="localrag")
+        vector_store.client.query.side_effect = [
+            [{"pk": 1, "text": "one"}, {"pk": 2, "text": "two"}],
+            [{"pk": 3, "text": "three"}],
+        ]
+        with mock.patch.object(document_api, "CHUNK_ID_QUERY_BATCH_SIZE", 2):
+            stored = await document_api.get_stored_chunk_ids(vector_store, [1, 2, 3])
+
+        self.assertEqual(stored, {"one": 1, "two": 2, "three": 3})
+        self.assertEqual(
+            [call.kwargs["limit"] for call in vector_store.client.query.call_args_list], [2, 1]
+        )
+        self.assertEqual(await document_api.get_stored_chunk_ids(vector_store, None), {})
+
+
+class MultiFileUploadTest(unittest.IsolatedAsyncioTestCase):
+    """A file whose processing is cancelled is reported as failed."""
+
+    async def test_cancelled_file_is_failed(self):
+        async def process(file_path, file_name):
+            if file_name == "b.md":
+                raise asyncio.CancelledError()
+
+        files = [
+            UploadFile(io.BytesIO(b"# a"), filename="a.md"),
+            UploadFile(io.BytesIO(b"# b"), filename="b.md"),
+        ]
+        with mock.patch.object(document_api, "process_file_upload_in_new_session", process):
+            response = await document_api.create_documents_file_upload(files)
+
+        self.assertEqual(response["processed"], ["a.md"])
+        self.assertEqual([f["file"] for f in response["failed"]], ["b.md"])
+
+
+    async def test_upload_concurrency_is_bounded(self):
+        active = peak = 0
+
+        async def process(file_path, file_name, session):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0)
+            active -= 1
+
+        session_maker = mock.Mock(return_value=mock.MagicMock())
+        files = [UploadFile(io.BytesIO(b"# doc"), filename=f"{i}.md") for i in range(6)]
+        with (
+            mock.patch.object(document_api, "get_upload_semaphore", return_value=asyncio.Semaphore(2)),
+            mock.patch.object(document_api, "get_async_session_maker", return_value=session_maker),
+            mock.patch.object(document_api, "process_file_upload_task", process),
+        ):
+            response = await document_api.create_documents_file_upload(files)
+
+        self.assertEqual(len(response["processed"]), 6)
+        self.assertEqual(peak, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
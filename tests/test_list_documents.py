@@ -0,0 +1,40 @@
+import unittest
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import document as document_api
+from app.db import get_async_session
+
+
+class ListDocumentsPageSizeTest(unittest.TestCase):
+    """page_size is a positive size or -1, the server-side cap always applies."""
+
+    def setUp(self):
+        self.session = mock.Mock()
+        self.session.execute = mock.AsyncMock(return_value=mock.MagicMock(scalar=mock.Mock(return_value=0)))
+        app = FastAPI()
+        app.include_router(document_api.router)
+        app.dependency_overrides[get_async_session] = lambda: self.session
+        self.client = TestClient(app)
+
+    def test_invalid_page_sizes_rejected(self):
+        for page_size in (-5, 0):
+            response = self.client.get("/documents/", params={"page_size": page_size})
+            self.assertEqual(response.status_code, 422, page_size)
+        self.session.execute.assert_not_awaited()
+
+    def test_negative_offset_rejected(self):
+        response = self.client.get("/documents/", params={"skip": -1})
+        self.assertEqual(response.status_code, 422)
+
+    def test_all_is_capped(self):
+        response = self.client.get("/documents/", params={"page_size": -1})
+        self.assertEqual(response.status_code, 200)
+        page_query = self.session.execute.await_args_list[-1].args[0]
+        self.assertEqual(page_query._limit_clause.value, document_api.MAX_PAGE_SIZE)
+
+
+if __name__ == "__main__":
+    unittest.main()
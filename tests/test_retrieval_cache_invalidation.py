@@ -0,0 +1,89 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from langchain_core.documents import Document
+
+from app.agent import nodes
+from app.agent.semantic_cache import retrieval_cache
+from app.api import document as document_api
+from app.models.api import DocumentBulkDelete
+
+
+EMBEDDING = [0.1, 0.2, 0.3]
+
+
+class RetrievalCacheInvalidationTest(unittest.IsolatedAsyncioTestCase):
+    """Changing the vector store must drop cached retrieval results."""
+
+    def setUp(self):
+        retrieval_cache.clear()
+        # the next identical query would be a hit if nothing invalidated it
+        retrieval_cache.put(EMBEDDING, [Document(page_content="stale")])
+
+        self.embeddings = embeddings = mock.Mock(aembed_query=mock.AsyncMock(return_value=EMBEDDING))
+        self.vector_store = mock.Mock(
+            asimilarity_search=mock.AsyncMock(return_value=[Document(page_content="fresh")]),
+            aadd_embeddings=mock.AsyncMock(return_value=["chunk-1"]),
+            adelete=mock.AsyncMock(),
+        )
+        for target in (
+            mock.patch.object(nodes, "get_embeddings", return_value=embeddings),
+            mock.patch.object(nodes, "get_vector_store", return_value=self.vector_store),
+            mock.patch.object(document_api, "get_vector_store", return_value=self.vector_store),
+        ):
+            target.start()
+            self.addCleanup(target.stop)
+
+    async def assert_next_retrieval_misses(self):
+        documents = await nodes.retrieve_relevant_documents("query")
+        self.assertEqual([doc.page_content for doc in documents], ["fresh"])
+        self.vector_store.asimilarity_search.assert_awaited_once()
+
+    async def test_cached_query_hits_without_changes(self):
+        documents = await nodes.retrieve_relevant_documents("query")
+        self.assertEqual([doc.page_content for doc in documents], ["stale"])
+        self.vector_store.asimilarity_search.assert_not_awaited()
+
+    async def test_miss_embeds_query_once(self):
+        retrieval_cache.clear()
+        with mock.patch.object(nodes, "get_vector_store", return_value=self.vector_store) as get_vector_store:
+            await self.assert_next_retrieval_misses()
+        query_embedding = get_vector_store.call_args.args[0]
+        self.assertEqual(await query_embedding.aembed_query("query"), EMBEDDING)
+        self.embeddings.aembed_query.assert_awaited_once_with("query")
+
+    async def test_upload_invalidates(self):
+        loader = mock.Mock(aload=mock.AsyncMock(return_value=[Document(page_content="new text")]))
+        session = mock.Mock(execute=mock.AsyncMock(), commit=mock.AsyncMock())
+        with (
+            mock.patch.object(document_api, "UnstructuredMarkdownLoader", return_value=loader),
+            mock.patch.object(document_api, "get_document_by_unique_identifier_hash", mock.AsyncMock(return_value=None)),
+            mock.patch.object(document_api, "embed_texts", mock.AsyncMock(return_value=[EMBEDDING])),
+        ):
+            await document_api.process_file_upload_task("/tmp/new.md", "new.md", session)
+        session.commit.assert_awaited()
+        await self.assert_next_retrieval_misses()
+
+    async def test_delete_invalidates(self):
+        stored = SimpleNamespace(related_chunks=["chunk-1"])
+        result = mock.Mock()
+        result.scalars.return_value.first.return_value = stored
+        session = mock.Mock(
+            execute=mock.AsyncMock(return_value=result),
+            delete=mock.AsyncMock(),
+            commit=mock.AsyncMock(),
+        )
+        await document_api.delete_document(1, session=session)
+        await self.assert_next_retrieval_misses()
+
+    async def test_bulk_delete_invalidates(self):
+        result = mock.Mock()
+        result.all.return_value = [SimpleNamespace(id=1, related_chunks=["chunk-1"])]
+        session = mock.Mock(execute=mock.AsyncMock(return_value=result), commit=mock.AsyncMock())
+        await document_api.bulk_delete_documents(DocumentBulkDelete(ids=[1]), session=session)
+        await self.assert_next_retrieval_misses()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+from unittest import mock
+
+from langchain_core.documents import Document
+
+from app.agent import semantic_cache
+from app.agent.semantic_cache import SemanticCache
+
+
+class SemanticCacheExpiryTest(unittest.TestCase):
+    """Expired entries are removed from the matrix, not only skipped."""
+
+    def test_expired_entries_are_dropped(self):
+        cache = SemanticCache(max_size=4, ttl=10.0)
+        with mock.patch.object(semantic_cache.time, "monotonic", return_value=0.0):
+            cache.put([1.0, 0.0], [Document(page_content="old")])
+        with mock.patch.object(semantic_cache.time, "monotonic", return_value=5.0):
+            cache.put([0.0, 1.0], [Document(page_content="new")])
+
+        with mock.patch.object(semantic_cache.time, "monotonic", return_value=12.0):
+            self.assertIsNone(cache.get([1.0, 0.0]))
+            self.assertEqual(cache.get_stats()["size"], 1)
+            self.assertEqual([doc.page_content for doc in cache.get([0.0, 1.0])], ["new"])
+            self.assertEqual(list(cache._order), [0])
+
+
+if __name__ == "__main__":
+    unittest.main()